@@ -0,0 +1,54 @@
+"""
+Benchmark de memória: bytes por inscrição armazenada.
+
+Compara o schema Pydantic (schemas.Inscricao) com a representação
+compacta usada internamente (registros.InscricaoRegistro).
+
+Uso (na raiz do repositório):
+    python -m benchmarks.bench_memoria --registros 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schemas
+from registros import InscricaoRegistro
+
+
+def medir(quantidade, criar):
+    gc.collect()
+    tracemalloc.start()
+    inicio, _ = tracemalloc.get_traced_memory()
+    lista = [criar() for _ in range(quantidade)]
+    fim, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del lista
+    return (fim - inicio) / quantidade
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--registros", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    # Todas as inscrições de uma mesma partida, como acontece na prática
+    id_partida = uuid4()
+
+    def pydantic():
+        return schemas.Inscricao(id=uuid4(), id_partida=id_partida, id_jogador=uuid4(), status="Pendente")
+
+    def compacto():
+        return InscricaoRegistro(uuid4().int, id_partida.int, uuid4().int, "Pendente")
+
+    print(f"Memória por inscrição ({args.registros} registros):")
+    print(f"  schemas.Inscricao:           {medir(args.registros, pydantic):>6.0f} bytes")
+    print(f"  registros.InscricaoRegistro: {medir(args.registros, compacto):>6.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark de escalabilidade com vários workers (estado compartilhado).
+
+Sobe o uvicorn com --workers 1..N usando GALERA_SHARED_DB e mede a vazão
+de uma carga mista (80% leituras de partida, 20% inscrições) disparada
+por vários processos clientes. No fim de cada rodada, confere se todas
+as inscrições feitas chegaram ao banco compartilhado.
+
+Uso (na raiz do repositório):
+    python -m benchmarks.bench_workers --max-workers 4 --duracao 10
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = "127.0.0.1"
+
+PARTIDA = {
+    "titulo": "Partida do benchmark",
+    "id_local": "3fa85f64-5717-4562-b3fc-2c963f66afa6",
+    "data_hora": "2025-09-15T19:00:00",
+    "duracao_estimada_min": 90,
+    "tipo": "Mista",
+    "categoria": "Amador",
+    "max_jogadores": 18,
+    "custo_por_jogador": 10.0,
+}
+
+
+def subir_servidor(porta, workers, banco):
+    env = dict(os.environ, GALERA_SHARED_DB=banco)
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", HOST, "--port", str(porta),
+         "--workers", str(workers), "--no-access-log", "--log-level", "warning"],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL,
+    )
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            conexao = http.client.HTTPConnection(HOST, porta, timeout=1)
+            conexao.request("GET", "/")
+            if conexao.getresponse().status == 200:
+                # Dá tempo para todos os workers terminarem de iniciar
+                time.sleep(1 + 0.2 * workers)
+                return processo
+        except OSError:
+            time.sleep(0.1)
+    processo.terminate()
+    raise RuntimeError("O servidor não iniciou a tempo")
+
+
+def cliente(args):
+    porta, partida_id, duracao, semente = args
+    aleatorio = random.Random(semente)
+    conexao = http.client.HTTPConnection(HOST, porta)
+    requisicoes = inscricoes = 0
+    fim = time.time() + duracao
+    while time.time() < fim:
+        if aleatorio.random() < 0.2:
+            conexao.request("POST", f"/partidas/{partida_id}/inscricoes")
+            esperado = 202
+        else:
+            conexao.request("GET", f"/partidas/{partida_id}")
+            esperado = 200
+        resposta = conexao.getresponse()
+        resposta.read()
+        if resposta.status != esperado:
+            raise RuntimeError(f"Status inesperado: {resposta.status}")
+        requisicoes += 1
+        inscricoes += esperado == 202
+    return requisicoes, inscricoes
+
+
+def rodada(workers, clientes, duracao, porta):
+    with tempfile.TemporaryDirectory() as diretorio:
+        banco = os.path.join(diretorio, "estado.db")
+        servidor = subir_servidor(porta, workers, banco)
+        try:
+            conexao = http.client.HTTPConnection(HOST, porta)
+            conexao.request("POST", "/partidas/", body=json.dumps(PARTIDA),
+                            headers={"Content-Type": "application/json"})
+            partida_id = json.loads(conexao.getresponse().read())["id"]
+
+            with multiprocessing.Pool(clientes) as pool:
+                resultados = pool.map(cliente, [(porta, partida_id, duracao, i) for i in range(clientes)])
+        finally:
+            servidor.terminate()
+            servidor.wait()
+
+        requisicoes = sum(r for r, _ in resultados)
+        inscricoes = sum(i for _, i in resultados)
+        gravadas = sqlite3.connect(banco).execute(
+            "SELECT COUNT(*) FROM registros WHERE colecao = 'inscricoes'"
+        ).fetchone()[0]
+        return requisicoes / duracao, inscricoes, gravadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clientes", type=int, default=None, help="processos clientes (padrão: 2 por worker)")
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por rodada")
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    base = None
+    print(f"{'workers':>7} {'req/s':>10} {'escala':>7}  inscrições (feitas/gravadas)")
+    for workers in range(1, args.max_workers + 1):
+        clientes = args.clientes or 2 * workers
+        vazao, feitas, gravadas = rodada(workers, clientes, args.duracao, args.porta)
+        base = base or vazao
+        print(f"{workers:>7} {vazao:>10,.0f} {vazao / base:>6.2f}x  {feitas}/{gravadas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+Benchmark de carga de todas as rotas (partidas, jogadores, convites e auth).
+
+Popula a API com N partidas e N inscrições sintéticas e dispara uma carga
+mista (navegar, entrar em partidas, aprovar, cancelar, login...) com
+vários usuários virtuais simultâneos. Para cada rota, reporta a vazão e
+as latências p50/p95/p99.
+
+Dois modos:
+  - asgi:    a aplicação roda no mesmo processo (httpx.ASGITransport);
+  - uvicorn: a aplicação roda em um uvicorn local (HTTP de verdade).
+
+E três tipos de persistência (--persistencia), cada rodada num diretório
+temporário novo:
+  - memoria:       só as listas em memória;
+  - duravel:       write-ahead log + snapshot (GALERA_DATA_DIR);
+  - compartilhado: estado num SQLite compartilhado (GALERA_SHARED_DB).
+
+Os resultados podem ser salvos em JSON e comparados com uma execução
+anterior; o processo termina com código 1 se alguma rota piorar mais que
+a tolerância (p95 ou vazão). Requer httpx.
+
+Uso (na raiz do repositório):
+    python -m benchmarks.carga --tamanhos 1000 10000 100000 --saida atual.json
+    python -m benchmarks.carga --tamanhos 1000 10000 100000 --baseline atual.json
+    python -m benchmarks.carga --persistencia duravel --tamanhos 1000 10000 --saida duravel.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.servidor import ORGANIZADOR, id_partida
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Peso de cada operação na carga mista
+PESOS = {
+    "listar_partidas": 1,
+    "ver_partida": 30,
+    "criar_partida": 2,
+    "editar_partida": 2,
+    "entrar": 15,
+    "listar_inscricoes": 3,
+    "aprovar": 10,
+    "cancelar": 5,
+    "login": 10,
+    "esqueci_senha": 2,
+    "meu_perfil": 8,
+    "perfil_publico": 5,
+    "convidar": 3,
+    "meus_convites": 4,
+}
+
+NOVA_PARTIDA = {
+    "titulo": "Partida do benchmark",
+    "id_local": "3fa85f64-5717-4562-b3fc-2c963f66afa6",
+    "data_hora": "2025-09-15T19:00:00",
+    "duracao_estimada_min": 90,
+    "tipo": "Mista",
+    "categoria": "Amador",
+    "max_jogadores": 18,
+    "custo_por_jogador": 10.0,
+}
+
+# Amostras mínimas de uma rota para que ela entre na comparação
+AMOSTRAS_MINIMAS = 20
+
+VARIAVEIS_PERSISTENCIA = ("GALERA_DATA_DIR", "GALERA_SHARED_DB")
+
+
+# ===================================================================
+#                         CARGA MISTA
+# ===================================================================
+
+class Carga:
+    """Estado compartilhado entre os usuários virtuais de uma rodada."""
+
+    def __init__(self, cliente: httpx.AsyncClient, tamanho: int, semente: int):
+        self.cliente = cliente
+        self.tamanho = tamanho
+        self.aleatorio = random.Random(semente)
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.erros: Dict[str, int] = defaultdict(int)
+        # Inscrições criadas durante a carga: (partida, inscrição, jogador)
+        self.pendentes: List[tuple] = []
+        self.confirmadas: List[tuple] = []
+
+    async def requisitar(self, rota: str, metodo: str, url: str, esperado: int, usuario=None, **kwargs):
+        headers = {"X-Usuario": str(usuario)} if usuario else {}
+        inicio = time.perf_counter()
+        try:
+            resposta = await self.cliente.request(metodo, url, headers=headers, **kwargs)
+        except httpx.TransportError:
+            # Timeout ou conexão perdida: conta como erro sem derrubar a rodada
+            self.latencias[rota].append(time.perf_counter() - inicio)
+            self.erros[rota] += 1
+            return None
+        self.latencias[rota].append(time.perf_counter() - inicio)
+        if resposta.status_code != esperado:
+            self.erros[rota] += 1
+            return None
+        return resposta
+
+    def partida_aleatoria(self):
+        return id_partida(self.aleatorio.randrange(self.tamanho))
+
+    async def executar(self, operacao: str, usuario):
+        if operacao == "listar_partidas":
+            await self.requisitar("GET /partidas/", "GET", "/partidas/", 200)
+        elif operacao == "ver_partida":
+            await self.requisitar("GET /partidas/{partida_id}", "GET", f"/partidas/{self.partida_aleatoria()}", 200)
+        elif operacao == "criar_partida":
+            await self.requisitar("POST /partidas/", "POST", "/partidas/", 201, ORGANIZADOR, json=NOVA_PARTIDA)
+        elif operacao == "editar_partida":
+            await self.requisitar(
+                "PUT /partidas/{partida_id}", "PUT", f"/partidas/{self.partida_aleatoria()}", 200,
+                ORGANIZADOR, json={"descricao": "Editada pelo benchmark"},
+            )
+        elif operacao == "entrar" or (operacao == "aprovar" and not self.pendentes):
+            partida = self.partida_aleatoria()
+            resposta = await self.requisitar(
+                "POST /partidas/{partida_id}/inscricoes", "POST", f"/partidas/{partida}/inscricoes", 202, usuario,
+            )
+            if resposta is not None:
+                self.pendentes.append((partida, resposta.json()["id"], usuario))
+        elif operacao == "listar_inscricoes":
+            await self.requisitar(
+                "GET /partidas/{partida_id}/inscricoes", "GET", f"/partidas/{self.partida_aleatoria()}/inscricoes",
+                200, ORGANIZADOR,
+            )
+        elif operacao == "aprovar":
+            partida, inscricao, jogador = self.pendentes.pop(self.aleatorio.randrange(len(self.pendentes)))
+            resposta = await self.requisitar(
+                "PUT /partidas/{partida_id}/inscricoes/{inscricao_id}", "PUT",
+                f"/partidas/{partida}/inscricoes/{inscricao}", 200, ORGANIZADOR, json={"status": "Confirmada"},
+            )
+            if resposta is not None:
+                self.confirmadas.append((partida, inscricao, jogador))
+        elif operacao == "cancelar":
+            inscritas = self.confirmadas or self.pendentes
+            if not inscritas:
+                return
+            partida, _, jogador = inscritas.pop(self.aleatorio.randrange(len(inscritas)))
+            await self.requisitar(
+                "DELETE /partidas/{partida_id}/inscricoes/me", "DELETE", f"/partidas/{partida}/inscricoes/me",
+                204, jogador,
+            )
+        elif operacao == "login":
+            await self.requisitar(
+                "POST /auth/login", "POST", "/auth/login", 200,
+                json={"email": "arthur@email.com", "senha": "senha123"},
+            )
+        elif operacao == "esqueci_senha":
+            await self.requisitar(
+                "POST /auth/forgot-password", "POST", "/auth/forgot-password", 200,
+                json={"email": "arthur@email.com"},
+            )
+        elif operacao == "meu_perfil":
+            await self.requisitar("GET /jogadores/me", "GET", "/jogadores/me", 200, usuario)
+        elif operacao == "perfil_publico":
+            await self.requisitar("GET /jogadores/{jogador_id}", "GET", f"/jogadores/{uuid4()}", 200)
+        elif operacao == "convidar":
+            await self.requisitar(
+                "POST /convites/", "POST", "/convites/", 201, usuario,
+                json={"email_convidado": "amigo@email.com"},
+            )
+        elif operacao == "meus_convites":
+            await self.requisitar("GET /convites/me", "GET", "/convites/me", 200, usuario)
+
+    async def usuario_virtual(self, fim: float):
+        usuario = uuid4()
+        operacoes = list(PESOS)
+        pesos = list(PESOS.values())
+        while time.perf_counter() < fim:
+            await self.executar(self.aleatorio.choices(operacoes, pesos)[0], usuario)
+
+    async def rodar(self, usuarios: int, duracao: float) -> dict:
+        inicio = time.perf_counter()
+        fim = inicio + duracao
+        await asyncio.gather(*(self.usuario_virtual(fim) for _ in range(usuarios)))
+        return resumir(self.latencias, self.erros, time.perf_counter() - inicio)
+
+
+def percentil(ordenadas: List[float], p: float) -> float:
+    """Percentil pelo método nearest-rank de uma lista já ordenada."""
+    indice = max(0, math.ceil(p / 100 * len(ordenadas)) - 1)
+    return ordenadas[indice]
+
+
+def resumir(latencias: Dict[str, List[float]], erros: Dict[str, int], duracao: float) -> dict:
+    rotas = {}
+    for rota, valores in sorted(latencias.items()):
+        valores.sort()
+        rotas[rota] = {
+            "requisicoes": len(valores),
+            "erros": erros.get(rota, 0),
+            "vazao": len(valores) / duracao,
+            "p50_ms": percentil(valores, 50) * 1000,
+            "p95_ms": percentil(valores, 95) * 1000,
+            "p99_ms": percentil(valores, 99) * 1000,
+        }
+    return rotas
+
+
+# ===================================================================
+#                      MODOS DE EXECUÇÃO
+# ===================================================================
+
+def variaveis_persistencia(persistencia: str, diretorio: str) -> Dict[str, str]:
+    """Variáveis de ambiente que ativam a persistência escolhida dentro de `diretorio`."""
+    if persistencia == "duravel":
+        return {"GALERA_DATA_DIR": os.path.join(diretorio, "dados")}
+    if persistencia == "compartilhado":
+        return {"GALERA_SHARED_DB": os.path.join(diretorio, "galera.db")}
+    return {}
+
+
+@contextlib.contextmanager
+def ambiente(variaveis: Dict[str, str]):
+    """Aplica `variaveis` (e remove as outras de persistência) em os.environ."""
+    anteriores = {nome: os.environ.get(nome) for nome in (*VARIAVEIS_PERSISTENCIA, *variaveis)}
+    for nome in VARIAVEIS_PERSISTENCIA:
+        os.environ.pop(nome, None)
+    os.environ.update(variaveis)
+    try:
+        yield
+    finally:
+        for nome, valor in anteriores.items():
+            if valor is None:
+                os.environ.pop(nome, None)
+            else:
+                os.environ[nome] = valor
+
+
+async def rodada_asgi(
+    tamanho: int, usuarios: int, duracao: float, semente: int, timeout: Optional[float], persistencia: str
+) -> dict:
+    from benchmarks import servidor
+
+    servidor.semear(tamanho, semente)
+    transporte = httpx.ASGITransport(app=servidor.app)
+    # Os handlers imprimem no stdout; isso não faz parte do que é medido
+    with tempfile.TemporaryDirectory() as diretorio, ambiente(variaveis_persistencia(persistencia, diretorio)), \
+            open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        # O lifespan configura a persistência (lendo as variáveis acima) e
+        # grava os dados semeados, como faria o uvicorn
+        async with servidor.app.router.lifespan_context(servidor.app):
+            async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", timeout=timeout) as cliente:
+                return await Carga(cliente, tamanho, semente).rodar(usuarios, duracao)
+
+
+async def rodada_uvicorn(
+    tamanho: int, usuarios: int, duracao: float, semente: int, porta: int, timeout: Optional[float], persistencia: str
+) -> dict:
+    diretorio = tempfile.TemporaryDirectory()
+    env = dict(os.environ, GALERA_BENCH_TAMANHO=str(tamanho))
+    for nome in VARIAVEIS_PERSISTENCIA:
+        env.pop(nome, None)
+    env.update(variaveis_persistencia(persistencia, diretorio.name))
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.servidor:app", "--host", "127.0.0.1",
+         "--port", str(porta), "--no-access-log", "--log-level", "warning"],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        limites = httpx.Limits(max_connections=usuarios)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{porta}", limits=limites, timeout=timeout) as cliente:
+            await esperar_servidor(cliente, processo)
+            return await Carga(cliente, tamanho, semente).rodar(usuarios, duracao)
+    finally:
+        processo.terminate()
+        processo.wait()
+        diretorio.cleanup()
+
+
+async def esperar_servidor(cliente: httpx.AsyncClient, processo: subprocess.Popen, timeout: float = 300):
+    # Popular 10^6 registros leva alguns segundos antes do servidor abrir a porta
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError("O uvicorn terminou antes de responder")
+        try:
+            if (await cliente.get("/", timeout=5)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("O servidor não iniciou a tempo")
+
+
+# ===================================================================
+#                 RELATÓRIO E COMPARAÇÃO COM BASELINE
+# ===================================================================
+
+def imprimir(tamanho: int, rotas: dict):
+    print(f"\n=== {tamanho} partidas / {tamanho} inscrições ===")
+    print(f"{'rota':<55} {'req':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>6}")
+    for rota, r in rotas.items():
+        print(
+            f"{rota:<55} {r['requisicoes']:>7} {r['vazao']:>9.1f} {r['p50_ms']:>8.2f} "
+            f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['erros']:>6}"
+        )
+
+
+def comparar(atual: dict, baseline: dict, tolerancia: float) -> List[str]:
+    """Lista as rotas cuja p95 subiu ou cuja vazão caiu mais que a tolerância."""
+    regressoes = []
+    for tamanho, rotas in atual["resultados"].items():
+        rotas_base = baseline.get("resultados", {}).get(tamanho, {})
+        for rota, r in rotas.items():
+            base = rotas_base.get(rota)
+            if base is None or min(r["requisicoes"], base["requisicoes"]) < AMOSTRAS_MINIMAS:
+                continue
+            if r["p95_ms"] > base["p95_ms"] * (1 + tolerancia):
+                regressoes.append(f"[{tamanho}] {rota}: p95 {base['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms")
+            if r["vazao"] < base["vazao"] * (1 - tolerancia):
+                regressoes.append(f"[{tamanho}] {rota}: vazão {base['vazao']:.1f} -> {r['vazao']:.1f} req/s")
+    return regressoes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modo", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--persistencia", choices=["memoria", "duravel", "compartilhado"], default="memoria",
+                        help="onde a API guarda o estado durante a carga (padrão: memoria)")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 10_000, 100_000],
+                        help="quantidade de partidas (e de inscrições) de cada rodada")
+    parser.add_argument("--usuarios", type=int, default=20, help="usuários virtuais simultâneos")
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por rodada")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--porta", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="segundos por requisição (padrão: sem limite; listar 10^6 partidas é lento)")
+    parser.add_argument("--saida", help="arquivo JSON onde salvar os resultados")
+    parser.add_argument("--baseline", help="arquivo JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="piora relativa aceita antes de falhar (padrão: 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for tamanho in args.tamanhos:
+        if args.modo == "asgi":
+            rodada = rodada_asgi(tamanho, args.usuarios, args.duracao, args.semente, args.timeout, args.persistencia)
+        else:
+            rodada = rodada_uvicorn(
+                tamanho, args.usuarios, args.duracao, args.semente, args.porta, args.timeout, args.persistencia
+            )
+        resultados[str(tamanho)] = asyncio.run(rodada)
+        imprimir(tamanho, resultados[str(tamanho)])
+
+    atual = {
+        "modo": args.modo,
+        "persistencia": args.persistencia,
+        "usuarios": args.usuarios,
+        "duracao": args.duracao,
+        "python": sys.version.split()[0],
+        "resultados": resultados,
+    }
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as arquivo:
+            baseline = json.load(arquivo)
+        # Baselines antigos não registravam a persistência: eram sempre em memória
+        for campo, padrao in (("modo", None), ("persistencia", "memoria")):
+            if baseline.get(campo, padrao) != atual[campo]:
+                print(f"\n{args.baseline} foi gerado com {campo}={baseline.get(campo, padrao)}, "
+                      f"não {atual[campo]}; os resultados não são comparáveis")
+                return 2
+        regressoes = comparar(atual, baseline, args.tolerancia)
+        if regressoes:
+            print(f"\nRegressões acima de {args.tolerancia:.0%}:")
+            for regressao in regressoes:
+                print(f"  {regressao}")
+            return 1
+        print(f"\nNenhuma regressão acima de {args.tolerancia:.0%} em relação a {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
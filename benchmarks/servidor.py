@@ -0,0 +1,91 @@
+"""
+Aplicação usada pelo benchmark de carga (benchmarks/carga.py).
+
+É o mesmo `main.app`, com duas diferenças:
+  - o usuário logado vem do header X-Usuario (um UUID), para que o
+    benchmark simule vários jogadores e um organizador fixo;
+  - se GALERA_BENCH_TAMANHO estiver definido, as listas são populadas
+    com dados sintéticos na importação (modo uvicorn).
+
+Uso direto:
+    GALERA_BENCH_TAMANHO=10000 uvicorn benchmarks.servidor:app
+"""
+import os
+import random
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from uuid import UUID, uuid4
+
+from fastapi import Header
+
+import schemas
+from main import app
+from registros import InscricaoRegistro, PartidaRegistro, datetime_para_epoch
+from routers import partidas
+from routers.jogadores import get_current_user_mock
+
+# IDs determinísticos: o processo cliente sabe quais partidas existem sem
+# precisar consultar o servidor
+ORGANIZADOR = UUID(int=1)
+_PREFIXO_PARTIDA = 1 << 64
+_UM_DIA = datetime_para_epoch(datetime(1970, 1, 2))
+
+
+def id_partida(indice: int) -> UUID:
+    return UUID(int=_PREFIXO_PARTIDA | indice)
+
+
+def semear(tamanho: int, semente: int = 0):
+    """Substitui os dados em memória por `tamanho` partidas e `tamanho` inscrições."""
+    aleatorio = random.Random(semente)
+    data_hora = datetime_para_epoch(datetime(2025, 9, 15, 19, 0, 0))
+    partidas.mock_db_inscricoes[:] = [
+        InscricaoRegistro(
+            aleatorio.getrandbits(128),
+            _PREFIXO_PARTIDA | (i % tamanho),
+            aleatorio.getrandbits(128),
+            "Pendente" if i % 2 else "Confirmada",
+        )
+        for i in range(tamanho)
+    ]
+    # O contador de cada partida bate com as inscrições confirmadas dela,
+    # para que aprovar/cancelar partam de um estado consistente
+    confirmadas = Counter(
+        inscricao.id_partida for inscricao in partidas.mock_db_inscricoes if inscricao.status == "Confirmada"
+    )
+    partidas.mock_db_partidas[:] = [
+        PartidaRegistro(
+            id=_PREFIXO_PARTIDA | i,
+            id_organizador=ORGANIZADOR.int,
+            id_local=aleatorio.getrandbits(128),
+            titulo=f"Partida sintética {i}",
+            data_hora=data_hora + _UM_DIA * (i % 365),
+            duracao_estimada_min=90,
+            tipo="Mista",
+            categoria="Amador",
+            max_jogadores=18,
+            custo_por_jogador=10.0,
+            descricao=None,
+            status="AbertaParaAdesao",
+            jogadores_confirmados_count=confirmadas[_PREFIXO_PARTIDA | i],
+        )
+        for i in range(tamanho)
+    ]
+
+
+def usuario_do_header(x_usuario: Optional[UUID] = Header(None)) -> schemas.Jogador:
+    """Substitui get_current_user_mock: o ID do jogador vem do header X-Usuario."""
+    return schemas.Jogador(
+        id=x_usuario or uuid4(),
+        nome="Jogador do Benchmark",
+        email="benchmark@email.com",
+        sexo="Masculino",
+        data_nascimento="1998-05-20",
+    )
+
+
+app.dependency_overrides[get_current_user_mock] = usuario_do_header
+
+if os.getenv("GALERA_BENCH_TAMANHO"):
+    semear(int(os.environ["GALERA_BENCH_TAMANHO"]))
@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import persistencia
+
+# ===================================================================
+#           CHAVES DE IDEMPOTÊNCIA (HEADER Idempotency-Key)
+# ===================================================================
+# Clientes em conexões ruins repetem POSTs (criar partida, pedir
+# inscrição, enviar convite). Se a requisição trouxer o header
+# Idempotency-Key, a primeira resposta é guardada em um cache com TTL e
+# devolvida nas repetições sem executar o handler de novo. Repetições
+# que chegam enquanto a primeira ainda está em andamento esperam por ela
+# em vez de executar em paralelo.
+#
+# Com vários workers (GALERA_SHARED_DB), as respostas e as execuções em
+# andamento ficam numa tabela do mesmo SQLite, para que uma repetição que
+# caia em outro worker também seja reconhecida.
+
+HEADER = b"idempotency-key"
+METODOS = {"POST", "PATCH"}
+TAMANHO_MAXIMO_CHAVE = 255
+TTL_PADRAO = 24 * 60 * 60
+MAX_ENTRADAS_PADRAO = 10_000
+# Modo compartilhado: se o worker que estava executando morrer, outro
+# assume a chave depois desse prazo (segundos)
+PRAZO_EXECUCAO_PADRAO = 60
+INTERVALO_ESPERA = 0.05
+
+
+class RespostaGuardada:
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], corpo: bytes, digest: bytes, expira_em: float):
+        self.status = status
+        self.headers = headers
+        self.corpo = corpo
+        self.digest = digest
+        self.expira_em = expira_em
+
+
+class CacheLocal:
+    """Respostas guardadas na memória do processo (LRU com TTL)."""
+
+    def __init__(self, ttl: float, max_entradas: int):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.respostas: "OrderedDict[str, RespostaGuardada]" = OrderedDict()
+        self.em_andamento: Dict[str, asyncio.Event] = {}
+
+    async def reservar(self, chave: str) -> Optional[RespostaGuardada]:
+        """Devolve a resposta guardada ou, se não houver, reserva a chave para executar."""
+        while True:
+            guardada = self._buscar(chave)
+            if guardada is not None:
+                return guardada
+            evento = self.em_andamento.get(chave)
+            if evento is None:
+                break
+            # Outra requisição com a mesma chave está em andamento: espera por ela
+            await evento.wait()
+        self.em_andamento[chave] = asyncio.Event()
+        return None
+
+    async def concluir(self, chave: str, guardada: Optional[RespostaGuardada]):
+        if guardada is not None:
+            guardada.expira_em = time.monotonic() + self.ttl
+            self.respostas[chave] = guardada
+            self.respostas.move_to_end(chave)
+            while len(self.respostas) > self.max_entradas:
+                self.respostas.popitem(last=False)
+        self.em_andamento.pop(chave).set()
+
+    def _buscar(self, chave: str) -> Optional[RespostaGuardada]:
+        guardada = self.respostas.get(chave)
+        if guardada is None:
+            return None
+        if guardada.expira_em <= time.monotonic():
+            del self.respostas[chave]
+            return None
+        self.respostas.move_to_end(chave)
+        return guardada
+
+
+class CacheCompartilhado:
+    """Respostas e reservas guardadas no SQLite compartilhado entre os workers."""
+
+    def __init__(self, caminho: str, ttl: float, max_entradas: int, prazo_execucao: float = PRAZO_EXECUCAO_PADRAO):
+        self.caminho = caminho
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.prazo_execucao = prazo_execucao
+        self._local = threading.local()
+        self._conexao().execute("""
+            CREATE TABLE IF NOT EXISTS idempotencia (
+                chave TEXT PRIMARY KEY,
+                em_andamento INTEGER NOT NULL,
+                expira_em REAL NOT NULL,
+                status INTEGER,
+                headers TEXT,
+                corpo BLOB,
+                digest BLOB
+            )
+        """)
+
+    def _conexao(self) -> sqlite3.Connection:
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            self._local.conexao = conexao
+        return conexao
+
+    async def reservar(self, chave: str) -> Optional[RespostaGuardada]:
+        while True:
+            resultado = await run_in_threadpool(self._tentar_reservar, chave)
+            if resultado != "esperar":
+                return resultado
+            # Outro worker (ou outra requisição deste) está executando
+            await asyncio.sleep(INTERVALO_ESPERA)
+
+    def _tentar_reservar(self, chave: str) -> Union[RespostaGuardada, str, None]:
+        conexao = self._conexao()
+        agora = time.time()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conexao.execute(
+                "SELECT em_andamento, expira_em, status, headers, corpo, digest FROM idempotencia WHERE chave = ?",
+                (chave,),
+            ).fetchone()
+            # Linhas vencidas (resposta expirada ou execução abandonada) são ignoradas
+            if linha is not None and linha[1] > agora:
+                conexao.execute("COMMIT")
+                em_andamento, expira_em, status, headers, corpo, digest = linha
+                if em_andamento:
+                    return "esperar"
+                return RespostaGuardada(
+                    status=status,
+                    headers=[(nome.encode("latin-1"), valor.encode("latin-1")) for nome, valor in json.loads(headers)],
+                    corpo=corpo,
+                    digest=digest,
+                    expira_em=expira_em,
+                )
+            conexao.execute(
+                "INSERT OR REPLACE INTO idempotencia (chave, em_andamento, expira_em) VALUES (?, 1, ?)",
+                (chave, agora + self.prazo_execucao),
+            )
+            conexao.execute("COMMIT")
+            return None
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+
+    async def concluir(self, chave: str, guardada: Optional[RespostaGuardada]):
+        await run_in_threadpool(self._concluir, chave, guardada)
+
+    def _concluir(self, chave: str, guardada: Optional[RespostaGuardada]):
+        conexao = self._conexao()
+        if guardada is None:
+            conexao.execute("DELETE FROM idempotencia WHERE chave = ?", (chave,))
+            return
+        agora = time.time()
+        headers = json.dumps([(nome.decode("latin-1"), valor.decode("latin-1")) for nome, valor in guardada.headers])
+        conexao.execute(
+            "UPDATE idempotencia SET em_andamento = 0, expira_em = ?, status = ?, headers = ?, corpo = ?, digest = ? "
+            "WHERE chave = ?",
+            (agora + self.ttl, guardada.status, headers, guardada.corpo, guardada.digest, chave),
+        )
+        # Limpeza: remove o que venceu e, acima do limite, as entradas mais antigas
+        conexao.execute("DELETE FROM idempotencia WHERE expira_em <= ?", (agora,))
+        conexao.execute(
+            "DELETE FROM idempotencia WHERE chave IN ("
+            "  SELECT chave FROM idempotencia WHERE em_andamento = 0 ORDER BY expira_em DESC LIMIT -1 OFFSET ?"
+            ")",
+            (self.max_entradas,),
+        )
+
+
+class IdempotenciaMiddleware:
+    """Middleware ASGI que torna seguros os reenvios de requisições mutáveis."""
+
+    def __init__(self, app: ASGIApp, ttl: float = TTL_PADRAO, max_entradas: int = MAX_ENTRADAS_PADRAO):
+        self.app = app
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.cache_local = CacheLocal(ttl, max_entradas)
+        self.cache_compartilhado: Optional[CacheCompartilhado] = None
+
+    def _cache(self) -> Union[CacheLocal, CacheCompartilhado]:
+        # A persistência só é configurada no startup, depois do middleware
+        armazenamento = persistencia.armazenamento
+        if isinstance(armazenamento, persistencia.ArmazenamentoCompartilhado):
+            if self.cache_compartilhado is None or self.cache_compartilhado.caminho != armazenamento.caminho:
+                self.cache_compartilhado = CacheCompartilhado(armazenamento.caminho, self.ttl, self.max_entradas)
+            return self.cache_compartilhado
+        return self.cache_local
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in METODOS:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        chave_cliente = headers.get(HEADER)
+        if chave_cliente is None:
+            return await self.app(scope, receive, send)
+        if not chave_cliente or len(chave_cliente) > TAMANHO_MAXIMO_CHAVE:
+            resposta = JSONResponse(
+                {"detail": f"Idempotency-Key deve ter entre 1 e {TAMANHO_MAXIMO_CHAVE} caracteres."},
+                status_code=400,
+            )
+            return await resposta(scope, receive, send)
+
+        corpo = await self._ler_corpo(receive)
+        digest = hashlib.sha256(corpo).digest()
+        # A chave vale para o mesmo usuário, método, rota e query string
+        partes = (
+            scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""),
+            headers.get(b"authorization", b""), chave_cliente,
+        )
+        chave = hashlib.sha256(b"\0".join(partes)).hexdigest()
+
+        cache = self._cache()
+        guardada = await cache.reservar(chave)
+        if guardada is not None:
+            return await self._repetir(guardada, digest, scope, receive, send)
+
+        nova = None
+        try:
+            nova = await self._executar(corpo, digest, scope, receive, send)
+        finally:
+            await cache.concluir(chave, nova)
+
+    async def _executar(self, corpo: bytes, digest: bytes, scope: Scope, receive: Receive, send: Send):
+        corpo_enviado = False
+
+        async def receber() -> Message:
+            nonlocal corpo_enviado
+            if not corpo_enviado:
+                corpo_enviado = True
+                return {"type": "http.request", "body": corpo, "more_body": False}
+            return await receive()
+
+        inicio: Optional[Message] = None
+        partes: List[bytes] = []
+
+        async def enviar(mensagem: Message):
+            nonlocal inicio
+            if mensagem["type"] == "http.response.start":
+                inicio = mensagem
+            elif mensagem["type"] == "http.response.body":
+                partes.append(mensagem.get("body", b""))
+            await send(mensagem)
+
+        await self.app(scope, receber, enviar)
+
+        # Erros do servidor não são guardados: o cliente pode tentar de novo
+        if inicio is None or inicio["status"] >= 500:
+            return None
+        return RespostaGuardada(
+            status=inicio["status"],
+            headers=list(inicio.get("headers", [])),
+            corpo=b"".join(partes),
+            digest=digest,
+            expira_em=0,
+        )
+
+    async def _repetir(self, guardada: RespostaGuardada, digest: bytes, scope: Scope, receive: Receive, send: Send):
+        if guardada.digest != digest:
+            resposta = JSONResponse(
+                {"detail": "Esta Idempotency-Key já foi usada com outro corpo de requisição."},
+                status_code=422,
+            )
+            return await resposta(scope, receive, send)
+
+        await send({
+            "type": "http.response.start",
+            "status": guardada.status,
+            "headers": guardada.headers + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": guardada.corpo})
+
+    @staticmethod
+    async def _ler_corpo(receive: Receive) -> bytes:
+        partes = []
+        while True:
+            mensagem = await receive()
+            partes.append(mensagem.get("body", b""))
+            if not mensagem.get("more_body", False):
+                return b"".join(partes)
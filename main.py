@@ -1,17 +1,34 @@
 # Importa o FastAPI
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
+import persistencia
+from idempotencia import IdempotenciaMiddleware
+
 # Importa TODOS os módulos de rotas da pasta /routers
 # Depois colocar avaliacoes e locais
 from routers import auth, jogadores, convites, partidas
 
+# Carrega os dados salvos (se GALERA_DATA_DIR estiver definido) ao iniciar
+# e garante que o log seja gravado em disco ao desligar
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    persistencia.configurar()
+    persistencia.recuperar()
+    yield
+    persistencia.fechar()
+
 # Cria a instância principal do aplicativo FastAPI
 app = FastAPI(
     title="API Galera do Vôlei",
     description="API completa para a comunidade online de praticantes de vôlei. Gerencie jogadores, partidas, inscrições e muito mais.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Reenvios com o mesmo header Idempotency-Key devolvem a primeira resposta
+app.add_middleware(IdempotenciaMiddleware)
+
 # Inclui os routers no aplicativo principal
 print("Registrando routers...")
 app.include_router(auth.router)
@@ -0,0 +1,725 @@
+import itertools
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# ===================================================================
+#           PERSISTÊNCIA EMBUTIDA (SNAPSHOT + WRITE-AHEAD LOG)
+# ===================================================================
+# Os "bancos" da API são listas em memória (ex: mock_db_partidas).
+# Este módulo dá durabilidade a essas listas sem precisar de um servidor
+# SQL: cada mutação é anexada a um log (write-ahead log) e, de tempos em
+# tempos, o estado completo é gravado num snapshot binário e o log é
+# truncado. Na inicialização: carrega o snapshot e reaplica o log.
+#
+# Uma mutação só é confirmada (e a requisição só responde) depois que o
+# log está em disco; as escritas simultâneas compartilham o mesmo fsync.
+#
+# Desativado por padrão. Para ativar, defina GALERA_DATA_DIR com o
+# diretório onde os arquivos serão gravados. O snapshot é um formato
+# próprio, independente da versão do Python:
+#
+#   assinatura (ASSINATURA_SNAPSHOT)
+#   tabela de textos: <I quantidade> <I tamanho>... <bytes UTF-8>
+#   por coleção:      <H tamanho> <nome> <B formato> <Q tamanho> <dados>
+#
+# Coleções que definem `empacotar`/`desempacotar` gravam seus registros
+# com um layout struct fixo (ver registros.py), cujas strings são índices
+# na tabela de textos (o índice 0 é None). As demais, ou uma coleção com
+# um inteiro que não cabe no layout, são gravadas como uma lista JSON.
+#
+# Para rodar com vários processos (uvicorn --workers N), defina
+# GALERA_SHARED_DB: o estado passa a ser compartilhado através de um
+# SQLite em modo WAL (ver ArmazenamentoCompartilhado).
+
+ARQUIVO_WAL = "mutacoes.wal"
+# Segmento do log fechado durante um snapshot; só é apagado depois que o
+# snapshot que o cobre estiver gravado
+ARQUIVO_WAL_ANTERIOR = "mutacoes.wal.anterior"
+ARQUIVO_SNAPSHOT = "estado.snapshot"
+# Identifica o formato do snapshot; mudar o layout exige uma versão nova
+PREFIXO_SNAPSHOT = b"GALERA-SNAPSHOT-"
+ASSINATURA_SNAPSHOT = PREFIXO_SNAPSHOT + b"2\n"
+FORMATO_BINARIO = 0
+FORMATO_JSON = 1
+_QUANTIDADE = struct.Struct("<I")
+_CABECALHO_COLECAO = struct.Struct("<BQ")
+_TAMANHO_NOME = struct.Struct("<H")
+
+# De quanto em quanto tempo (segundos) verifica se é hora de um snapshot
+INTERVALO_PADRAO = 0.05
+# Quantos registros no log disparam um novo snapshot (compactação)
+REGISTROS_POR_SNAPSHOT_PADRAO = 100_000
+# Quantas alterações o modo compartilhado mantém para os outros workers;
+# um worker que ficar mais atrasado que isso recarrega tudo
+ALTERACOES_MANTIDAS_PADRAO = 10_000
+
+
+class Colecao:
+    """Descreve como uma lista em memória é identificada e serializada."""
+
+    def __init__(
+        self,
+        lista: List[Any],
+        chave: Callable[[Any], Any],
+        serializar: Callable[[Any], Any],
+        desserializar: Callable[[Any], Any],
+        copiar: Optional[Callable[[Any, Any], None]] = None,
+        empacotar: Optional[Callable[[List[Any], Dict[Optional[str], int]], bytes]] = None,
+        desempacotar: Optional[Callable[[memoryview, List[Optional[str]]], List[Any]]] = None,
+    ):
+        self.lista = lista
+        self.chave = chave
+        self.serializar = serializar
+        self.desserializar = desserializar
+        # copiar(destino, origem): atualiza um objeto "in place", para que
+        # referências já obtidas por um handler continuem válidas
+        self.copiar = copiar
+        # Layout binário do snapshot: empacotar(objetos, textos) -> bytes e
+        # desempacotar(dados, textos) -> objetos
+        self.empacotar = empacotar
+        self.desempacotar = desempacotar
+
+
+class WriteAheadLog:
+    """
+    Log de mutações só de anexação, uma linha JSON por registro.
+
+    `anexar` só escreve no buffer. Quem precisa de durabilidade chama
+    `esperar(seq)`: a primeira thread que espera faz um único fsync de
+    tudo o que já foi escrito (por todas as threads) e acorda as outras
+    (group commit). Quem chega durante esse fsync entra no próximo lote.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.total = 0
+        self.seq_escrito = 0
+        self.seq_duravel = 0
+        self._geracao = 0
+        self._sincronizando = False
+        self._condicao = threading.Condition()
+        # Impede que o arquivo seja fechado/rotacionado durante um fsync
+        self._lock_fsync = threading.Lock()
+        self._arquivo = open(caminho, "a", encoding="utf-8")
+
+    def anexar(self, registro: Dict[str, Any]) -> int:
+        """Escreve um registro (chamar com o lock de escrita) e devolve sua sequência."""
+        self._arquivo.write(json.dumps(registro, separators=(",", ":")) + "\n")
+        self.total += 1
+        self.seq_escrito += 1
+        return self.seq_escrito
+
+    def esperar(self, seq: int, lock_escrita: threading.RLock):
+        """Bloqueia até o registro `seq` estar em disco."""
+        with self._condicao:
+            while self.seq_duravel < seq and self._sincronizando:
+                self._condicao.wait()
+            if self.seq_duravel >= seq:
+                return
+            self._sincronizando = True
+
+        # Esta thread é a líder do lote
+        alvo = None
+        try:
+            with lock_escrita:
+                self._arquivo.flush()
+                candidato = self.seq_escrito
+                geracao = self._geracao
+                descritor = self._arquivo.fileno()
+            with self._lock_fsync:
+                # Se o arquivo foi rotacionado nesse meio tempo, a rotação já fez o fsync
+                if geracao == self._geracao:
+                    os.fsync(descritor)
+            alvo = candidato
+        finally:
+            with self._condicao:
+                self._sincronizando = False
+                if alvo is not None:
+                    self.seq_duravel = max(self.seq_duravel, alvo)
+                self._condicao.notify_all()
+
+    def confirmar(self):
+        """Grava em disco (fsync) tudo o que já foi escrito. Chamar com o lock de escrita."""
+        with self._lock_fsync:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._marcar_duravel()
+
+    def _marcar_duravel(self):
+        with self._condicao:
+            self.seq_duravel = self.seq_escrito
+            self._condicao.notify_all()
+
+    def rotacionar(self, destino: str):
+        """Fecha o segmento atual, movendo-o para `destino`, e abre um novo vazio."""
+        with self._lock_fsync:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._arquivo.close()
+            self._geracao += 1
+            if os.path.exists(destino):
+                # Sobrou um segmento de um snapshot interrompido: junta os dois
+                with open(destino, "a", encoding="utf-8") as anterior, open(self.caminho, "r", encoding="utf-8") as atual:
+                    anterior.write(atual.read())
+                    anterior.flush()
+                    os.fsync(anterior.fileno())
+                os.remove(self.caminho)
+            else:
+                os.replace(self.caminho, destino)
+            self._arquivo = open(self.caminho, "a", encoding="utf-8")
+            self.total = 0
+            self._marcar_duravel()
+
+    def fechar(self):
+        with self._lock_fsync:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._arquivo.close()
+            self._geracao += 1
+            self._marcar_duravel()
+
+    @staticmethod
+    def ler(caminho: str):
+        """Itera sobre os registros do log, ignorando uma última linha incompleta."""
+        if not os.path.exists(caminho):
+            return
+        with open(caminho, "r", encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                try:
+                    yield json.loads(linha)
+                except json.JSONDecodeError:
+                    # Escrita interrompida por uma queda: o resto do log é descartado
+                    return
+
+
+class ArmazenamentoDuravel:
+    """Mantém as coleções registradas em disco via snapshot + write-ahead log."""
+
+    def __init__(
+        self,
+        diretorio: str,
+        colecoes: Optional[Dict[str, Colecao]] = None,
+        intervalo: float = INTERVALO_PADRAO,
+        registros_por_snapshot: int = REGISTROS_POR_SNAPSHOT_PADRAO,
+    ):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.registros_por_snapshot = registros_por_snapshot
+        self.colecoes: Dict[str, Colecao] = colecoes if colecoes is not None else {}
+        self.wal: Optional[WriteAheadLog] = None
+        self._lock = threading.RLock()
+        self._lock_snapshot = threading.Lock()
+        self._local = threading.local()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def caminho_wal(self) -> str:
+        return os.path.join(self.diretorio, ARQUIVO_WAL)
+
+    @property
+    def caminho_wal_anterior(self) -> str:
+        return os.path.join(self.diretorio, ARQUIVO_WAL_ANTERIOR)
+
+    @property
+    def caminho_snapshot(self) -> str:
+        return os.path.join(self.diretorio, ARQUIVO_SNAPSHOT)
+
+    def registrar_colecao(self, nome: str, colecao: Colecao):
+        self.colecoes[nome] = colecao
+
+    # --- Recuperação ---
+
+    def recuperar(self):
+        """Carrega o snapshot, reaplica o log e inicia a compactação periódica."""
+        with self._lock:
+            estados = {nome: {c.chave(o): o for o in c.lista} for nome, c in self.colecoes.items()}
+
+            if os.path.exists(self.caminho_snapshot):
+                snapshot = self._ler_snapshot()
+                for nome, colecao in self.colecoes.items():
+                    estados[nome] = {colecao.chave(o): o for o in snapshot.get(nome, [])}
+
+            reaplicados = 0
+            registros = itertools.chain(
+                WriteAheadLog.ler(self.caminho_wal_anterior), WriteAheadLog.ler(self.caminho_wal)
+            )
+            for registro in registros:
+                reaplicados += 1
+                colecao = self.colecoes.get(registro["c"])
+                if colecao is None:
+                    continue
+                if registro["op"] == "put":
+                    objeto = colecao.desserializar(registro["v"])
+                    estados[registro["c"]][colecao.chave(objeto)] = objeto
+                else:
+                    estados[registro["c"]].pop(registro["k"], None)
+
+            # Substitui o conteúdo "in place": os routers mantêm a mesma lista
+            for nome, colecao in self.colecoes.items():
+                colecao.lista[:] = estados[nome].values()
+
+            # Compacta o que foi recuperado (e grava os dados iniciais na 1ª execução)
+            self.wal = WriteAheadLog(self.caminho_wal)
+            if reaplicados or not os.path.exists(self.caminho_snapshot):
+                self.snapshot()
+
+        self._thread = threading.Thread(target=self._compactar_periodicamente, daemon=True)
+        self._thread.start()
+
+    # --- Mutações ---
+
+    @contextmanager
+    def transacao(self):
+        """
+        Serializa as mutações para que a ordem do log seja a ordem aplicada.
+        Ao sair, espera o log estar em disco (fora do lock, para que outras
+        transações entrem no mesmo fsync).
+        """
+        profundidade = getattr(self._local, "profundidade", 0)
+        self._local.profundidade = profundidade + 1
+        try:
+            with self._lock:
+                yield
+        finally:
+            self._local.profundidade = profundidade
+        if not profundidade:
+            self._esperar_disco()
+
+    def _anexar(self, registro: Dict[str, Any]):
+        with self._lock:
+            self._local.seq = self.wal.anexar(registro)
+        if not getattr(self._local, "profundidade", 0):
+            self._esperar_disco()
+
+    def _esperar_disco(self):
+        seq = getattr(self._local, "seq", 0)
+        if seq:
+            self._local.seq = 0
+            self.wal.esperar(seq, self._lock)
+
+    def gravar(self, nome: str, objeto: Any):
+        colecao = self.colecoes[nome]
+        self._anexar({"c": nome, "op": "put", "v": colecao.serializar(objeto)})
+
+    def remover(self, nome: str, objeto: Any):
+        colecao = self.colecoes[nome]
+        self._anexar({"c": nome, "op": "del", "k": colecao.chave(objeto)})
+
+    def sincronizar(self):
+        """Nada a fazer: com um único processo a memória já é a fonte da verdade."""
+
+    # --- Snapshot / compactação ---
+
+    def snapshot(self):
+        """Grava o estado completo em um snapshot binário e descarta o log já coberto."""
+        with self._lock_snapshot:
+            # Sob o lock, só o que é barato: fechar o segmento do log e copiar
+            # as referências das listas. A serialização e o fsync, que levam
+            # segundos com milhões de registros, rodam sem travar as mutações.
+            with self._lock:
+                self.wal.rotacionar(self.caminho_wal_anterior)
+                copias = {nome: list(colecao.lista) for nome, colecao in self.colecoes.items()}
+
+            # Um registro alterado depois da rotação pode entrar no snapshot já
+            # com o valor novo (ou, com vários campos, só parte dele); tudo bem,
+            # porque a mesma alteração está no segmento novo do log e é
+            # reaplicada por cima na recuperação, desde que esse segmento
+            # esteja em disco antes do snapshot substituir o antigo (abaixo).
+            textos: Dict[Optional[str], int] = {None: 0}
+            secoes = [
+                (nome, *self._empacotar(self.colecoes[nome], objetos, textos))
+                for nome, objetos in copias.items()
+            ]
+            temporario = self.caminho_snapshot + ".tmp"
+            with open(temporario, "wb") as arquivo:
+                arquivo.write(ASSINATURA_SNAPSHOT)
+                # surrogatepass: strings vindas de JSON podem ter surrogates isolados
+                codificados = [texto.encode("utf-8", "surrogatepass") for texto in itertools.islice(textos, 1, None)]
+                arquivo.write(_QUANTIDADE.pack(len(codificados)))
+                arquivo.write(struct.pack(f"<{len(codificados)}I", *map(len, codificados)))
+                arquivo.write(b"".join(codificados))
+                for nome, formato, dados in secoes:
+                    nome_codificado = nome.encode("utf-8")
+                    arquivo.write(_TAMANHO_NOME.pack(len(nome_codificado)) + nome_codificado)
+                    arquivo.write(_CABECALHO_COLECAO.pack(formato, len(dados)))
+                    arquivo.write(dados)
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            # Sob o lock nenhuma transação está no meio, então tudo o que a
+            # serialização viu já tem registro no log; o fsync garante que esse
+            # registro está em disco antes da troca. Troca atômica: uma queda
+            # antes daqui deixa o snapshot antigo + os dois segmentos do log
+            with self._lock:
+                self.wal.confirmar()
+                os.replace(temporario, self.caminho_snapshot)
+            os.remove(self.caminho_wal_anterior)
+
+    @staticmethod
+    def _empacotar(colecao: Colecao, objetos: List[Any], textos: Dict[Optional[str], int]):
+        if colecao.empacotar is not None:
+            try:
+                return FORMATO_BINARIO, colecao.empacotar(objetos, textos)
+            except (struct.error, OverflowError):
+                # Algum valor não cabe no layout fixo (ex: inteiro com mais de 64 bits)
+                pass
+        dados = json.dumps([colecao.serializar(o) for o in objetos], separators=(",", ":"))
+        return FORMATO_JSON, dados.encode("utf-8")
+
+    def _ler_snapshot(self) -> Dict[str, List[Any]]:
+        # Mapeado em memória: os registros são lidos direto das páginas do
+        # arquivo, sem copiar o snapshot inteiro para um buffer antes
+        with open(self.caminho_snapshot, "rb") as arquivo:
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                assinatura = mapa[:len(ASSINATURA_SNAPSHOT)]
+                if assinatura != ASSINATURA_SNAPSHOT:
+                    if assinatura.startswith(PREFIXO_SNAPSHOT):
+                        raise ValueError(
+                            f"{self.caminho_snapshot} foi gravado em outro formato "
+                            f"({assinatura.strip().decode(errors='replace')}); "
+                            f"esta versão lê apenas {ASSINATURA_SNAPSHOT.strip().decode()}"
+                        )
+                    raise ValueError(f"{self.caminho_snapshot} não é um snapshot válido")
+                with memoryview(mapa) as dados:
+                    return self._ler_colecoes(dados, len(ASSINATURA_SNAPSHOT))
+
+    def _ler_colecoes(self, dados: memoryview, posicao: int) -> Dict[str, List[Any]]:
+        (quantidade,) = _QUANTIDADE.unpack_from(dados, posicao)
+        posicao += _QUANTIDADE.size
+        tamanhos = struct.unpack_from(f"<{quantidade}I", dados, posicao)
+        posicao += 4 * quantidade
+        textos: List[Optional[str]] = [None]
+        for tamanho in tamanhos:
+            textos.append(str(dados[posicao:posicao + tamanho], "utf-8", "surrogatepass"))
+            posicao += tamanho
+
+        resultado = {}
+        while posicao < len(dados):
+            (tamanho_nome,) = _TAMANHO_NOME.unpack_from(dados, posicao)
+            posicao += _TAMANHO_NOME.size
+            nome = str(dados[posicao:posicao + tamanho_nome], "utf-8")
+            posicao += tamanho_nome
+            formato, tamanho = _CABECALHO_COLECAO.unpack_from(dados, posicao)
+            posicao += _CABECALHO_COLECAO.size
+            colecao = self.colecoes.get(nome)
+            if colecao is not None:
+                with dados[posicao:posicao + tamanho] as trecho:
+                    if formato == FORMATO_JSON:
+                        resultado[nome] = [colecao.desserializar(v) for v in json.loads(bytes(trecho))]
+                    elif colecao.desempacotar is not None:
+                        resultado[nome] = colecao.desempacotar(trecho, textos)
+                    else:
+                        raise ValueError(
+                            f"A coleção '{nome}' do snapshot está em formato binário, mas não define desempacotar"
+                        )
+            posicao += tamanho
+        return resultado
+
+    def _compactar_periodicamente(self):
+        while not self._parar.wait(self.intervalo):
+            if self.wal.total >= self.registros_por_snapshot:
+                self.snapshot()
+
+    def fechar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            if self.wal is not None:
+                self.wal.fechar()
+
+
+class ArmazenamentoCompartilhado:
+    """Compartilha as coleções entre processos através de um SQLite em modo WAL.
+
+    Cada processo continua servindo leituras das suas listas em memória,
+    que funcionam como cache. Toda mutação grava o registro na tabela
+    `registros` e anexa uma linha em `alteracoes`; essa tabela é o canal
+    de invalidação entre os workers: antes de cada requisição, o processo
+    lê as alterações com `seq` maior que a última que já aplicou e
+    atualiza apenas os registros afetados.
+
+    As mutações rodam dentro de `BEGIN IMMEDIATE`, que serializa os
+    escritores de todos os processos. O cache é sincronizado no início
+    da transação, então o handler sempre altera a versão mais recente.
+
+    Para aplicar uma alteração sem percorrer a lista inteira, cada coleção
+    tem um índice chave -> objeto, mantido por `gravar`, `remover` e
+    `_recarregar`.
+    """
+
+    def __init__(
+        self,
+        caminho: str,
+        colecoes: Optional[Dict[str, Colecao]] = None,
+        alteracoes_mantidas: int = ALTERACOES_MANTIDAS_PADRAO,
+    ):
+        self.caminho = caminho
+        self.colecoes: Dict[str, Colecao] = colecoes if colecoes is not None else {}
+        self.alteracoes_mantidas = alteracoes_mantidas
+        self.ultima_seq = 0
+        self._indices: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._conexoes: List[sqlite3.Connection] = []
+
+    def _conexao(self) -> sqlite3.Connection:
+        # sqlite3 não permite compartilhar conexões entre threads do threadpool
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(
+                self.caminho, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+            with self._lock:
+                self._conexoes.append(conexao)
+        return conexao
+
+    def registrar_colecao(self, nome: str, colecao: Colecao):
+        self.colecoes[nome] = colecao
+
+    # --- Recuperação ---
+
+    def recuperar(self):
+        """Cria as tabelas, grava os dados iniciais (1º processo) e carrega o cache."""
+        conexao = self._conexao()
+        conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS registros (
+                colecao TEXT NOT NULL,
+                chave TEXT NOT NULL,
+                valor TEXT NOT NULL,
+                PRIMARY KEY (colecao, chave)
+            );
+            CREATE TABLE IF NOT EXISTS alteracoes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                colecao TEXT NOT NULL,
+                chave TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (nome TEXT PRIMARY KEY, valor TEXT);
+        """)
+        with self._lock:
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                inicializado = conexao.execute(
+                    "SELECT 1 FROM meta WHERE nome = 'inicializado'"
+                ).fetchone()
+                if not inicializado:
+                    for nome, colecao in self.colecoes.items():
+                        for objeto in colecao.lista:
+                            self._upsert(conexao, nome, colecao, objeto)
+                    conexao.execute("INSERT INTO meta VALUES ('inicializado', '1')")
+                self._recarregar(conexao)
+                conexao.execute("COMMIT")
+            except BaseException:
+                conexao.execute("ROLLBACK")
+                raise
+
+    def _recarregar(self, conexao: sqlite3.Connection):
+        """Substitui todo o cache pelo conteúdo do banco."""
+        self.ultima_seq = conexao.execute("SELECT COALESCE(MAX(seq), 0) FROM alteracoes").fetchone()[0]
+        for nome, colecao in self.colecoes.items():
+            linhas = conexao.execute(
+                "SELECT valor FROM registros WHERE colecao = ? ORDER BY rowid", (nome,)
+            )
+            colecao.lista[:] = [colecao.desserializar(json.loads(valor)) for (valor,) in linhas]
+            self._indices[nome] = {str(colecao.chave(o)): o for o in colecao.lista}
+
+    # --- Invalidação do cache ---
+
+    def sincronizar(self):
+        """Aplica no cache local as alterações feitas pelos outros processos."""
+        conexao = self._conexao()
+        # Verificação barata (sem lock) para o caso comum: nada mudou
+        ultima = conexao.execute("SELECT COALESCE(MAX(seq), 0) FROM alteracoes").fetchone()[0]
+        if ultima == self.ultima_seq:
+            return
+        with self._lock:
+            self._sincronizar(conexao)
+
+    def _sincronizar(self, conexao: sqlite3.Connection):
+        primeira = conexao.execute("SELECT MIN(seq) FROM alteracoes").fetchone()[0]
+        if primeira is not None and primeira > self.ultima_seq + 1:
+            # As alterações que faltam já foram descartadas: recarrega tudo
+            self._recarregar(conexao)
+            return
+
+        alteradas: Dict[str, set] = {}
+        for seq, nome, chave in conexao.execute(
+            "SELECT seq, colecao, chave FROM alteracoes WHERE seq > ? ORDER BY seq", (self.ultima_seq,)
+        ):
+            alteradas.setdefault(nome, set()).add(chave)
+            self.ultima_seq = seq
+
+        for nome, chaves in alteradas.items():
+            colecao = self.colecoes.get(nome)
+            if colecao is None:
+                continue
+            indice = self._indices[nome]
+            removidos = set()
+            for chave in chaves:
+                linha = conexao.execute(
+                    "SELECT valor FROM registros WHERE colecao = ? AND chave = ?", (nome, chave)
+                ).fetchone()
+                atual = indice.get(chave)
+                if linha is None:
+                    if atual is not None:
+                        removidos.add(id(indice.pop(chave)))
+                    continue
+                objeto = colecao.desserializar(json.loads(linha[0]))
+                if atual is None:
+                    colecao.lista.append(objeto)
+                    indice[chave] = objeto
+                elif colecao.copiar is not None:
+                    colecao.copiar(atual, objeto)
+                else:
+                    posicao = next(i for i, o in enumerate(colecao.lista) if o is atual)
+                    colecao.lista[posicao] = objeto
+                    indice[chave] = objeto
+            # Só remoções percorrem a lista (para manter a ordem de inserção)
+            if removidos:
+                colecao.lista[:] = [o for o in colecao.lista if id(o) not in removidos]
+
+    # --- Mutações ---
+
+    @contextmanager
+    def transacao(self):
+        """Transação entre processos: trava os escritores e sincroniza o cache."""
+        with self._lock:
+            profundidade = getattr(self._local, "profundidade", 0)
+            self._local.profundidade = profundidade + 1
+            try:
+                if profundidade:
+                    yield
+                    return
+                conexao = self._conexao()
+                conexao.execute("BEGIN IMMEDIATE")
+                self._local.escreveu = False
+                try:
+                    self._sincronizar(conexao)
+                    yield
+                    conexao.execute("COMMIT")
+                except BaseException:
+                    conexao.execute("ROLLBACK")
+                    # Se o handler já tinha gravado algo, a memória pode estar
+                    # à frente do banco. Erros de validação (403, 404...) saem
+                    # antes de qualquer escrita e não precisam recarregar.
+                    if self._local.escreveu:
+                        self._recarregar(conexao)
+                    raise
+            finally:
+                self._local.profundidade = profundidade
+
+    def _upsert(self, conexao: sqlite3.Connection, nome: str, colecao: Colecao, objeto: Any):
+        # UPSERT preserva o rowid, mantendo a ordem de inserção das listas
+        conexao.execute(
+            "INSERT INTO registros (colecao, chave, valor) VALUES (?, ?, ?) "
+            "ON CONFLICT (colecao, chave) DO UPDATE SET valor = excluded.valor",
+            (nome, str(colecao.chave(objeto)), json.dumps(colecao.serializar(objeto), separators=(",", ":"))),
+        )
+
+    def _anunciar(self, conexao: sqlite3.Connection, nome: str, chave: str):
+        self._local.escreveu = True
+        cursor = conexao.execute("INSERT INTO alteracoes (colecao, chave) VALUES (?, ?)", (nome, chave))
+        self.ultima_seq = cursor.lastrowid
+        if self.ultima_seq % self.alteracoes_mantidas == 0:
+            conexao.execute("DELETE FROM alteracoes WHERE seq <= ?", (self.ultima_seq - self.alteracoes_mantidas,))
+
+    def gravar(self, nome: str, objeto: Any):
+        colecao = self.colecoes[nome]
+        chave = str(colecao.chave(objeto))
+        with self.transacao():
+            conexao = self._conexao()
+            self._upsert(conexao, nome, colecao, objeto)
+            self._anunciar(conexao, nome, chave)
+            # O handler já colocou o objeto na lista; o índice acompanha
+            self._indices[nome][chave] = objeto
+
+    def remover(self, nome: str, objeto: Any):
+        colecao = self.colecoes[nome]
+        chave = str(colecao.chave(objeto))
+        with self.transacao():
+            conexao = self._conexao()
+            conexao.execute("DELETE FROM registros WHERE colecao = ? AND chave = ?", (nome, chave))
+            self._anunciar(conexao, nome, chave)
+            self._indices[nome].pop(chave, None)
+
+    def fechar(self):
+        with self._lock:
+            for conexao in self._conexoes:
+                conexao.close()
+            self._conexoes.clear()
+            self._local = threading.local()
+
+
+# ===================================================================
+#           INSTÂNCIA GLOBAL USADA PELOS ROUTERS
+# ===================================================================
+# Quando a persistência está desativada, as funções abaixo não fazem nada
+# além de serializar as mutações, e a API continua puramente em memória.
+
+colecoes: Dict[str, Colecao] = {}
+armazenamento: Optional[Union[ArmazenamentoDuravel, ArmazenamentoCompartilhado]] = None
+_lock_memoria = threading.RLock()
+
+
+def registrar_colecao(nome: str, colecao: Colecao):
+    """Chamado por cada router para expor sua lista em memória."""
+    colecoes[nome] = colecao
+
+
+def configurar(diretorio: Optional[str] = None, banco_compartilhado: Optional[str] = None, **opcoes):
+    """
+    Ativa o estado compartilhado em `banco_compartilhado` (ou GALERA_SHARED_DB)
+    ou, senão, a persistência em `diretorio` (ou GALERA_DATA_DIR).
+    """
+    global armazenamento
+    banco_compartilhado = banco_compartilhado or os.getenv("GALERA_SHARED_DB")
+    diretorio = diretorio or os.getenv("GALERA_DATA_DIR")
+    if banco_compartilhado:
+        armazenamento = ArmazenamentoCompartilhado(banco_compartilhado, colecoes=colecoes, **opcoes)
+    elif diretorio:
+        armazenamento = ArmazenamentoDuravel(diretorio, colecoes=colecoes, **opcoes)
+    return armazenamento
+
+
+def recuperar():
+    if armazenamento is not None:
+        armazenamento.recuperar()
+
+
+def transacao():
+    if armazenamento is not None:
+        return armazenamento.transacao()
+    return _lock_memoria
+
+
+def gravar(nome: str, objeto: Any):
+    if armazenamento is not None:
+        armazenamento.gravar(nome, objeto)
+
+
+def remover(nome: str, objeto: Any):
+    if armazenamento is not None:
+        armazenamento.remover(nome, objeto)
+
+
+def sincronizar():
+    """Dependência dos routers: atualiza o cache local antes de cada requisição."""
+    if armazenamento is not None:
+        armazenamento.sincronizar()
+
+
+def fechar():
+    global armazenamento
+    if armazenamento is not None:
+        armazenamento.fechar()
+        armazenamento = None
@@ -0,0 +1,248 @@
+import struct
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
+import schemas
+
+# ===================================================================
+#           REPRESENTAÇÃO INTERNA DOS REGISTROS
+# ===================================================================
+# Os schemas Pydantic são usados apenas na fronteira da API (entrada e
+# saída). Internamente, partidas e inscrições são guardadas em classes
+# com __slots__ (sem __dict__ por instância), com UUIDs como inteiros de
+# 128 bits e datas como microssegundos desde a época (UTC), que guardam
+# a data sem perder precisão num único inteiro. Strings repetidas
+# (status, tipo, categoria) são internadas e compartilhadas entre registros.
+#
+# Obs: datas sem fuso horário são tratadas como UTC, e todas as datas
+# voltam da API em UTC (com fuso).
+#
+# No snapshot (persistencia.py) cada registro é gravado com um layout
+# struct fixo, little-endian: UUIDs em 16 bytes, inteiros em 8, floats em
+# 8 e strings como índice (4 bytes) na tabela de textos do snapshot, onde
+# o índice 0 é None.
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def int_para_uuid(valor: int) -> UUID:
+    return UUID(int=valor)
+
+
+def datetime_para_epoch(valor: datetime) -> int:
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return (valor - _EPOCA) // timedelta(microseconds=1)
+
+
+def epoch_para_datetime(valor: int) -> datetime:
+    return _EPOCA + timedelta(microseconds=valor)
+
+
+def _uuid_para_bytes(valor: int) -> bytes:
+    return valor.to_bytes(16, "little")
+
+
+# ==================
+#      PARTIDA
+# ==================
+
+# Campos da partida que aceitam None (os demais são obrigatórios no schema)
+_CAMPOS_OPCIONAIS_PARTIDA = {"descricao"}
+
+# id, id_organizador, id_local, titulo, data_hora, duracao_estimada_min,
+# tipo, categoria, max_jogadores, custo_por_jogador, descricao, status,
+# jogadores_confirmados_count
+_BINARIO_PARTIDA = struct.Struct("<16s16s16sIqqIIqdIIq")
+
+
+@dataclass
+class PartidaRegistro:
+    __slots__ = (
+        "id", "id_organizador", "id_local", "titulo", "data_hora",
+        "duracao_estimada_min", "tipo", "categoria", "max_jogadores",
+        "custo_por_jogador", "descricao", "status", "jogadores_confirmados_count",
+    )
+
+    id: int
+    id_organizador: int
+    id_local: int
+    titulo: str
+    data_hora: int
+    duracao_estimada_min: int
+    tipo: str
+    categoria: str
+    max_jogadores: int
+    custo_por_jogador: float
+    descricao: Optional[str]
+    status: str
+    jogadores_confirmados_count: int
+
+    @classmethod
+    def de_schema(cls, partida: schemas.Partida) -> "PartidaRegistro":
+        return cls(
+            id=partida.id.int,
+            id_organizador=partida.id_organizador.int,
+            id_local=partida.id_local.int,
+            titulo=partida.titulo,
+            data_hora=datetime_para_epoch(partida.data_hora),
+            duracao_estimada_min=partida.duracao_estimada_min,
+            tipo=sys.intern(partida.tipo),
+            categoria=sys.intern(partida.categoria),
+            max_jogadores=partida.max_jogadores,
+            custo_por_jogador=partida.custo_por_jogador,
+            descricao=partida.descricao,
+            status=sys.intern(partida.status),
+            jogadores_confirmados_count=partida.jogadores_confirmados_count,
+        )
+
+    def para_schema(self) -> schemas.Partida:
+        return schemas.Partida(
+            id=int_para_uuid(self.id),
+            id_organizador=int_para_uuid(self.id_organizador),
+            id_local=int_para_uuid(self.id_local),
+            titulo=self.titulo,
+            data_hora=epoch_para_datetime(self.data_hora),
+            duracao_estimada_min=self.duracao_estimada_min,
+            tipo=self.tipo,
+            categoria=self.categoria,
+            max_jogadores=self.max_jogadores,
+            custo_por_jogador=self.custo_por_jogador,
+            descricao=self.descricao,
+            status=self.status,
+            jogadores_confirmados_count=self.jogadores_confirmados_count,
+        )
+
+    def atualizar(self, dados: Dict[str, Any]):
+        """
+        Aplica um dicionário no formato do schema (ex: PartidaUpdate).
+        `None` só limpa os campos opcionais; nos obrigatórios é ignorado.
+        """
+        for campo, valor in dados.items():
+            if valor is None:
+                if campo not in _CAMPOS_OPCIONAIS_PARTIDA:
+                    continue
+            elif campo == "id_local":
+                valor = valor.int
+            elif campo == "data_hora":
+                valor = datetime_para_epoch(valor)
+            elif campo in ("tipo", "categoria", "status"):
+                valor = sys.intern(valor)
+            setattr(self, campo, valor)
+
+    def para_tupla(self) -> tuple:
+        return tuple(getattr(self, campo) for campo in self.__slots__)
+
+    def copiar_de(self, outro: "PartidaRegistro"):
+        for campo in self.__slots__:
+            setattr(self, campo, getattr(outro, campo))
+
+    @classmethod
+    def de_tupla(cls, valores: Sequence[Any]) -> "PartidaRegistro":
+        registro = cls(*valores)
+        registro.tipo = sys.intern(registro.tipo)
+        registro.categoria = sys.intern(registro.categoria)
+        registro.status = sys.intern(registro.status)
+        return registro
+
+    @staticmethod
+    def empacotar(registros: List["PartidaRegistro"], textos: Dict[Optional[str], int]) -> bytes:
+        """Layout binário do snapshot; `textos` acumula a tabela de strings."""
+        def texto(valor: Optional[str]) -> int:
+            return textos.setdefault(valor, len(textos))
+
+        pack = _BINARIO_PARTIDA.pack
+        return b"".join([
+            pack(
+                _uuid_para_bytes(r.id), _uuid_para_bytes(r.id_organizador), _uuid_para_bytes(r.id_local),
+                texto(r.titulo), r.data_hora, r.duracao_estimada_min, texto(r.tipo), texto(r.categoria),
+                r.max_jogadores, r.custo_por_jogador, texto(r.descricao), texto(r.status),
+                r.jogadores_confirmados_count,
+            )
+            for r in registros
+        ])
+
+    @classmethod
+    def desempacotar(cls, dados: memoryview, textos: List[Optional[str]]) -> List["PartidaRegistro"]:
+        # Os textos vêm de uma tabela sem repetições: strings iguais já são
+        # o mesmo objeto, sem precisar de sys.intern
+        uuid = int.from_bytes
+        return [
+            cls(
+                uuid(id, "little"), uuid(id_organizador, "little"), uuid(id_local, "little"),
+                textos[titulo], data_hora, duracao, textos[tipo], textos[categoria],
+                max_jogadores, custo, textos[descricao], textos[status], confirmados,
+            )
+            for (
+                id, id_organizador, id_local, titulo, data_hora, duracao, tipo, categoria,
+                max_jogadores, custo, descricao, status, confirmados,
+            ) in _BINARIO_PARTIDA.iter_unpack(dados)
+        ]
+
+
+# ==================
+#    INSCRIÇÃO
+# ==================
+
+# id, id_partida, id_jogador, status
+_BINARIO_INSCRICAO = struct.Struct("<16s16s16sI")
+
+
+@dataclass
+class InscricaoRegistro:
+    __slots__ = ("id", "id_partida", "id_jogador", "status")
+
+    id: int
+    id_partida: int
+    id_jogador: int
+    status: str
+
+    @classmethod
+    def de_schema(cls, inscricao: schemas.Inscricao) -> "InscricaoRegistro":
+        return cls(
+            id=inscricao.id.int,
+            id_partida=inscricao.id_partida.int,
+            id_jogador=inscricao.id_jogador.int,
+            status=sys.intern(inscricao.status),
+        )
+
+    def para_schema(self) -> schemas.Inscricao:
+        return schemas.Inscricao(
+            id=int_para_uuid(self.id),
+            id_partida=int_para_uuid(self.id_partida),
+            id_jogador=int_para_uuid(self.id_jogador),
+            status=self.status,
+        )
+
+    def para_tupla(self) -> tuple:
+        return (self.id, self.id_partida, self.id_jogador, self.status)
+
+    def copiar_de(self, outro: "InscricaoRegistro"):
+        self.status = outro.status
+
+    @classmethod
+    def de_tupla(cls, valores: Sequence[Any]) -> "InscricaoRegistro":
+        id, id_partida, id_jogador, status = valores
+        return cls(id, id_partida, id_jogador, sys.intern(status))
+
+    @staticmethod
+    def empacotar(registros: List["InscricaoRegistro"], textos: Dict[Optional[str], int]) -> bytes:
+        pack = _BINARIO_INSCRICAO.pack
+        return b"".join([
+            pack(
+                _uuid_para_bytes(r.id), _uuid_para_bytes(r.id_partida), _uuid_para_bytes(r.id_jogador),
+                textos.setdefault(r.status, len(textos)),
+            )
+            for r in registros
+        ])
+
+    @classmethod
+    def desempacotar(cls, dados: memoryview, textos: List[Optional[str]]) -> List["InscricaoRegistro"]:
+        uuid = int.from_bytes
+        return [
+            cls(uuid(id, "little"), uuid(id_partida, "little"), uuid(id_jogador, "little"), textos[status])
+            for id, id_partida, id_jogador, status in _BINARIO_INSCRICAO.iter_unpack(dados)
+        ]
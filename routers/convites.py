@@ -4,14 +4,28 @@ from uuid import uuid4
 
 # Importa os schemas e a dependência de autenticação mockada
 import schemas
+import persistencia
 from routers.jogadores import get_current_user_mock # Reutilizando nosso mock de jogador logado
 
 # Cria o router específico para convites
 router = APIRouter(
     prefix="/convites",
-    tags=["Convites"]
+    tags=["Convites"],
+    dependencies=[Depends(persistencia.sincronizar)]
 )
 
+# ===================================================================
+#           BANCO DE DADOS FALSO (MOCK)
+# ===================================================================
+mock_db_convites = []
+
+persistencia.registrar_colecao("convites", persistencia.Colecao(
+    mock_db_convites,
+    chave=lambda convite: str(convite.id),
+    serializar=lambda convite: convite.model_dump(mode="json"),
+    desserializar=schemas.Convite.model_validate,
+))
+
 # ===================================================================
 #                           ENDPOINTS
 # ===================================================================
@@ -51,13 +65,17 @@ def criar_convite(
     
     # Retornando um objeto mockado que corresponde ao schema de resposta
     from datetime import datetime
-    convite_mockado = {
-        "id": uuid4(),
-        "email_convidado": convite_data.email_convidado,
-        "id_convidou": current_user.id,
-        "status": "pendente",
-        "data_envio": datetime.now()
-    }
+    convite_mockado = schemas.Convite(
+        id=uuid4(),
+        email_convidado=convite_data.email_convidado,
+        id_convidou=current_user.id,
+        status="pendente",
+        data_envio=datetime.now()
+    )
+
+    with persistencia.transacao():
+        mock_db_convites.append(convite_mockado)
+        persistencia.gravar("convites", convite_mockado)
     
     return convite_mockado
 
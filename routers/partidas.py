@@ -1,28 +1,37 @@
+import dataclasses
+
 from fastapi import APIRouter, HTTPException, status, Depends
+from pydantic import ValidationError
 from typing import List, Optional
 from uuid import UUID, uuid4
 from datetime import datetime, date
 
 import schemas
+import persistencia
+from registros import PartidaRegistro, InscricaoRegistro
 from routers.jogadores import get_current_user_mock
 
 router = APIRouter(
     prefix="/partidas",
-    tags=["Partida e Inscrições"]
+    tags=["Partida e Inscrições"],
+    # Com vários workers, aplica as alterações dos outros processos antes de cada requisição
+    dependencies=[Depends(persistencia.sincronizar)]
 )
 
 # ===================================================================
 #           BANCO DE DADOS FALSO (MOCK)
 # ===================================================================
-# Para este esqueleto, vamos simular nosso banco de dados com uma lista
-mock_db_partidas = []
-mock_db_inscricoes = []
+# Para este esqueleto, vamos simular nosso banco de dados com uma lista.
+# As listas guardam a representação compacta (registros.py); a conversão
+# para os schemas Pydantic acontece apenas na resposta dos endpoints.
+mock_db_partidas: List[PartidaRegistro] = []
+mock_db_inscricoes: List[InscricaoRegistro] = []
 
 # Criando alguns dados iniciais para teste
 organizador_id_mock = uuid4()
 partida_id_mock = uuid4()
 
-mock_db_partidas.append(
+mock_db_partidas.append(PartidaRegistro.de_schema(
     schemas.Partida(
         id=partida_id_mock,
         titulo="Vôlei de Segunda em Teresina",
@@ -38,7 +47,31 @@ mock_db_partidas.append(
         status="AbertaParaAdesao",
         jogadores_confirmados_count=5
     )
-)
+))
+
+# Expõe as listas para a camada de persistência (snapshot + write-ahead log)
+def _colecao_de_registros(lista, tipo_registro):
+    return persistencia.Colecao(
+        lista,
+        chave=lambda registro: registro.id,
+        serializar=tipo_registro.para_tupla,
+        desserializar=tipo_registro.de_tupla,
+        copiar=tipo_registro.copiar_de,
+        empacotar=tipo_registro.empacotar,
+        desempacotar=tipo_registro.desempacotar,
+    )
+
+persistencia.registrar_colecao("partidas", _colecao_de_registros(mock_db_partidas, PartidaRegistro))
+persistencia.registrar_colecao("inscricoes", _colecao_de_registros(mock_db_inscricoes, InscricaoRegistro))
+
+def _buscar_partida(partida_id: UUID) -> PartidaRegistro:
+    """Busca o registro interno de uma partida ou levanta 404."""
+    chave = partida_id.int
+    for partida in mock_db_partidas:
+        if partida.id == chave:
+            return partida
+
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Partida não encontrada")
 
 # ===================================================================
 #                     ENDPOINTS DE PARTIDA
@@ -57,13 +90,19 @@ def criar_partida(
     nova_partida = schemas.Partida(
         id=uuid4(),
         id_organizador=current_user.id,
+        status="AbertaParaAdesao",
+        jogadores_confirmados_count=0,
         **partida_data.dict()
     )
     
     # Lógica de DB: Salvar a nova_partida no banco de dados
-    mock_db_partidas.append(nova_partida)
+    registro = PartidaRegistro.de_schema(nova_partida)
+    with persistencia.transacao():
+        mock_db_partidas.append(registro)
+        persistencia.gravar("partidas", registro)
     
-    return nova_partida
+    # Responde a partir do registro salvo, igual ao GET /partidas/{id}
+    return registro.para_schema()
 
 @router.get("/", response_model=List[schemas.Partida])
 def listar_partidas(cidade: Optional[str] = None, data: Optional[date] = None):
@@ -73,7 +112,7 @@ def listar_partidas(cidade: Optional[str] = None, data: Optional[date] = None):
     """
     # Lógica de DB: Buscar partidas no banco, aplicando os filtros
     print("Listando todas as partidas disponíveis...")
-    return mock_db_partidas
+    return [partida.para_schema() for partida in mock_db_partidas]
 
 @router.get("/{partida_id}", response_model=schemas.Partida)
 def ler_partida(partida_id: UUID):
@@ -81,11 +120,7 @@ def ler_partida(partida_id: UUID):
     Obtém todos os detalhes de uma partida específica.
     """
     # Lógica de DB: Buscar a partida pelo ID
-    for partida in mock_db_partidas:
-        if partida.id == partida_id:
-            return partida
-            
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Partida não encontrada")
+    return _buscar_partida(partida_id).para_schema()
 
 @router.put("/{partida_id}", response_model=schemas.Partida)
 def atualizar_partida(
@@ -96,24 +131,28 @@ def atualizar_partida(
     """
     Atualiza os dados de uma partida. Ação restrita ao organizador.
     """
-    partida_existente = None
-    for p in mock_db_partidas:
-        if p.id == partida_id:
-            partida_existente = p
-            break
-            
-    if not partida_existente:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Partida não encontrada")
+    update_dict = update_data.dict(exclude_unset=True)
+    # A busca e as verificações ficam dentro da transação: com vários
+    # workers, é ela que garante que estamos vendo a versão mais recente
+    with persistencia.transacao():
+        partida_existente = _buscar_partida(partida_id)
 
-    # REGRA DE NEGÓCIO: Apenas o organizador pode editar
-    if partida_existente.id_organizador != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas o organizador pode editar a partida")
+        # REGRA DE NEGÓCIO: Apenas o organizador pode editar
+        if partida_existente.id_organizador != current_user.id.int:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas o organizador pode editar a partida")
 
-    update_dict = update_data.dict(exclude_unset=True)
-    for key, value in update_dict.items():
-        setattr(partida_existente, key, value)
-        
-    return partida_existente
+        # Aplica numa cópia e valida antes de tocar no registro e no log:
+        # um registro que não volta para o schema quebraria as leituras
+        partida_atualizada = dataclasses.replace(partida_existente)
+        partida_atualizada.atualizar(update_dict)
+        try:
+            resposta = partida_atualizada.para_schema()
+        except ValidationError as erro:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=erro.errors())
+
+        partida_existente.copiar_de(partida_atualizada)
+        persistencia.gravar("partidas", partida_existente)
+        return resposta
 
 
 # ===================================================================
@@ -128,19 +167,21 @@ def solicitar_inscricao(
     """
     Um jogador solicita a entrada em uma partida ("Puxar Partida").
     """
-    # Lógica para verificar se a partida existe, se não está lotada, etc.
-    partida = ler_partida(partida_id) # Reutiliza a função que já busca a partida
-    if partida.status != "AbertaParaAdesao":
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Esta partida não está aceitando inscrições.")
-
-    nova_inscricao = schemas.Inscricao(
-        id=uuid4(),
-        id_partida=partida_id,
-        id_jogador=current_user.id,
-        status="Pendente"
-    )
-    mock_db_inscricoes.append(nova_inscricao)
-    return nova_inscricao
+    with persistencia.transacao():
+        # Lógica para verificar se a partida existe, se não está lotada, etc.
+        partida = _buscar_partida(partida_id) # Reutiliza a função que já busca a partida
+        if partida.status != "AbertaParaAdesao":
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Esta partida não está aceitando inscrições.")
+
+        nova_inscricao = InscricaoRegistro(
+            id=uuid4().int,
+            id_partida=partida.id,
+            id_jogador=current_user.id.int,
+            status="Pendente"
+        )
+        mock_db_inscricoes.append(nova_inscricao)
+        persistencia.gravar("inscricoes", nova_inscricao)
+    return nova_inscricao.para_schema()
 
 @router.get("/{partida_id}/inscricoes", response_model=List[schemas.Inscricao])
 def listar_inscricoes(
@@ -150,11 +191,11 @@ def listar_inscricoes(
     """
     Lista as solicitações de inscrição para uma partida. Ação restrita ao organizador.
     """
-    partida = ler_partida(partida_id)
-    if partida.id_organizador != current_user.id:
+    partida = _buscar_partida(partida_id)
+    if partida.id_organizador != current_user.id.int:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas o organizador pode ver a lista de inscrições.")
 
-    inscricoes_da_partida = [insc for insc in mock_db_inscricoes if insc.id_partida == partida_id]
+    inscricoes_da_partida = [insc.para_schema() for insc in mock_db_inscricoes if insc.id_partida == partida.id]
     return inscricoes_da_partida
 
 @router.put("/{partida_id}/inscricoes/{inscricao_id}", response_model=schemas.Inscricao)
@@ -167,17 +208,20 @@ def gerenciar_inscricao(
     """
     O organizador aprova ou rejeita uma solicitação de inscrição.
     """
-    partida = ler_partida(partida_id)
-    if partida.id_organizador != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas o organizador pode gerenciar inscrições.")
-
-    for insc in mock_db_inscricoes:
-        if insc.id == inscricao_id and insc.id_partida == partida_id:
-            insc.status = update_data.status
-            # Lógica de negócio: Se aprovado, incrementar o contador na partida
-            if update_data.status == "Confirmada":
-                partida.jogadores_confirmados_count += 1
-            return insc
+    with persistencia.transacao():
+        partida = _buscar_partida(partida_id)
+        if partida.id_organizador != current_user.id.int:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas o organizador pode gerenciar inscrições.")
+
+        for insc in mock_db_inscricoes:
+            if insc.id == inscricao_id.int and insc.id_partida == partida.id:
+                insc.status = update_data.status
+                persistencia.gravar("inscricoes", insc)
+                # Lógica de negócio: Se aprovado, incrementar o contador na partida
+                if update_data.status == "Confirmada":
+                    partida.jogadores_confirmados_count += 1
+                    persistencia.gravar("partidas", partida)
+                return insc.para_schema()
             
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Inscrição não encontrada")
 
@@ -189,19 +233,22 @@ def cancelar_inscricao(
     """
     Um jogador que já foi aceito desiste da partida.
     """
-    inscricao_para_remover = None
-    for insc in mock_db_inscricoes:
-        if insc.id_partida == partida_id and insc.id_jogador == current_user.id:
-            inscricao_para_remover = insc
-            break
-
-    if not inscricao_para_remover:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Você não possui inscrição nesta partida.")
-
-    mock_db_inscricoes.remove(inscricao_para_remover)
-    # Lógica de negócio: Decrementar o contador na partida
-    partida = ler_partida(partida_id)
-    if partida.jogadores_confirmados_count > 0:
-        partida.jogadores_confirmados_count -= 1
+    with persistencia.transacao():
+        inscricao_para_remover = None
+        for insc in mock_db_inscricoes:
+            if insc.id_partida == partida_id.int and insc.id_jogador == current_user.id.int:
+                inscricao_para_remover = insc
+                break
+
+        if not inscricao_para_remover:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Você não possui inscrição nesta partida.")
+
+        # Lógica de negócio: Decrementar o contador na partida
+        partida = _buscar_partida(partida_id)
+        mock_db_inscricoes.remove(inscricao_para_remover)
+        persistencia.remover("inscricoes", inscricao_para_remover)
+        if partida.jogadores_confirmados_count > 0:
+            partida.jogadores_confirmados_count -= 1
+            persistencia.gravar("partidas", partida)
         
     return
\ No newline at end of file
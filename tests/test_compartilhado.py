@@ -0,0 +1,119 @@
+"""
+Sincronização do cache entre workers no ArmazenamentoCompartilhado.
+
+Dois armazenamentos sobre o mesmo arquivo SQLite, cada um com a sua
+lista, fazem o papel de dois processos do uvicorn.
+"""
+import pytest
+
+import persistencia
+from registros import InscricaoRegistro
+
+PARTIDA = 7
+
+
+def nova_colecao(lista):
+    return persistencia.Colecao(
+        lista,
+        chave=lambda registro: registro.id,
+        serializar=InscricaoRegistro.para_tupla,
+        desserializar=InscricaoRegistro.de_tupla,
+        copiar=InscricaoRegistro.copiar_de,
+    )
+
+
+@pytest.fixture
+def workers(tmp_path):
+    banco = str(tmp_path / "galera.db")
+    iniciais = [InscricaoRegistro(id, PARTIDA, 1000 + id, "Pendente") for id in (1, 2, 3)]
+    abertos = []
+    for lista in (iniciais, []):
+        armazenamento = persistencia.ArmazenamentoCompartilhado(banco, {"inscricoes": nova_colecao(lista)})
+        armazenamento.recuperar()
+        abertos.append(armazenamento)
+    yield abertos
+    for armazenamento in abertos:
+        armazenamento.fechar()
+
+
+def lista_de(armazenamento):
+    return armazenamento.colecoes["inscricoes"].lista
+
+
+def buscar(armazenamento, id):
+    return next(r for r in lista_de(armazenamento) if r.id == id)
+
+
+def estado(armazenamento):
+    return sorted((r.id, r.status) for r in lista_de(armazenamento))
+
+
+def test_segundo_worker_carrega_os_dados_iniciais(workers):
+    a, b = workers
+    assert estado(b) == estado(a) == [(1, "Pendente"), (2, "Pendente"), (3, "Pendente")]
+
+
+def test_sincronizar_aplica_alteracoes_dos_outros(workers):
+    a, b = workers
+    referencia = buscar(b, 2)
+
+    with a.transacao():
+        registro = buscar(a, 2)
+        registro.status = "Confirmada"
+        a.gravar("inscricoes", registro)
+        novo = InscricaoRegistro(4, PARTIDA, 1004, "Pendente")
+        lista_de(a).append(novo)
+        a.gravar("inscricoes", novo)
+        removido = buscar(a, 1)
+        lista_de(a).remove(removido)
+        a.remover("inscricoes", removido)
+
+    b.sincronizar()
+    assert estado(b) == [(2, "Confirmada"), (3, "Pendente"), (4, "Pendente")]
+    # Registros alterados são atualizados "in place"
+    assert referencia.status == "Confirmada" and buscar(b, 2) is referencia
+
+    # O índice acompanha as alterações locais e as recebidas
+    with b.transacao():
+        registro = buscar(b, 4)
+        registro.status = "Confirmada"
+        b.gravar("inscricoes", registro)
+    a.sincronizar()
+    assert estado(a) == estado(b)
+
+
+def test_transacao_ve_a_versao_mais_recente(workers):
+    a, b = workers
+    with a.transacao():
+        registro = buscar(a, 3)
+        registro.status = "Confirmada"
+        a.gravar("inscricoes", registro)
+
+    # Sem chamar sincronizar(): a transação já começa atualizada
+    with b.transacao():
+        assert buscar(b, 3).status == "Confirmada"
+
+
+def test_rollback_recarrega_o_cache_se_houve_escrita(workers):
+    a, b = workers
+    with pytest.raises(RuntimeError):
+        with b.transacao():
+            registro = buscar(b, 1)
+            registro.status = "Confirmada"
+            b.gravar("inscricoes", registro)
+            raise RuntimeError("falha depois de gravar")
+
+    assert buscar(b, 1).status == "Pendente"
+    a.sincronizar()
+    assert buscar(a, 1).status == "Pendente"
+
+
+def test_rollback_sem_escrita_nao_recarrega(workers):
+    a, b = workers
+    referencia = buscar(b, 1)
+    with pytest.raises(RuntimeError):
+        with b.transacao():
+            # Ex: 403/404 levantados antes de qualquer escrita
+            raise RuntimeError("falha antes de gravar")
+
+    assert buscar(b, 1) is referencia
@@ -0,0 +1,143 @@
+"""
+Middleware de Idempotency-Key: repetições simultâneas executam uma vez,
+chave reusada com outro corpo dá 422, e no modo compartilhado uma
+repetição que cai em outro worker também é reconhecida.
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+import persistencia
+from idempotencia import IdempotenciaMiddleware
+
+
+def nova_app():
+    """Aplicação mínima: conta as execuções e demora um pouco para responder."""
+    app = FastAPI()
+    app.add_middleware(IdempotenciaMiddleware)
+    app.state.execucoes = 0
+
+    @app.post("/itens", status_code=201)
+    async def criar(request: Request):
+        app.state.execucoes += 1
+        numero = app.state.execucoes
+        await asyncio.sleep(0.05)
+        return {"numero": numero, "corpo": await request.json()}
+
+    @app.post("/falha")
+    async def falhar():
+        app.state.execucoes += 1
+        raise RuntimeError("erro do servidor")
+
+    return app
+
+
+def cliente(app):
+    transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transporte, base_url="http://teste")
+
+
+@pytest.fixture
+def banco_compartilhado(tmp_path, monkeypatch):
+    # A middleware decide o modo pelo armazenamento configurado
+    armazenamento = persistencia.ArmazenamentoCompartilhado(str(tmp_path / "galera.db"))
+    monkeypatch.setattr(persistencia, "armazenamento", armazenamento)
+    yield armazenamento
+    armazenamento.fechar()
+
+
+def test_repeticoes_simultaneas_executam_uma_vez():
+    app = nova_app()
+
+    async def rodar():
+        async with cliente(app) as c:
+            headers = {"Idempotency-Key": "chave-1"}
+            return await asyncio.gather(*(c.post("/itens", json={"a": 1}, headers=headers) for _ in range(5)))
+
+    respostas = asyncio.run(rodar())
+    assert app.state.execucoes == 1
+    assert {r.status_code for r in respostas} == {201}
+    assert {r.json()["numero"] for r in respostas} == {1}
+    assert sorted(r.headers.get("idempotent-replayed", "") for r in respostas) == ["", "true", "true", "true", "true"]
+
+
+def test_chave_reusada_com_outro_corpo_da_422():
+    app = nova_app()
+
+    async def rodar():
+        async with cliente(app) as c:
+            headers = {"Idempotency-Key": "chave-1"}
+            primeira = await c.post("/itens", json={"a": 1}, headers=headers)
+            outra = await c.post("/itens", json={"a": 2}, headers=headers)
+            return primeira, outra
+
+    primeira, outra = asyncio.run(rodar())
+    assert primeira.status_code == 201
+    assert outra.status_code == 422
+    assert app.state.execucoes == 1
+
+
+def test_chave_considera_query_string_e_sem_header_nao_guarda():
+    app = nova_app()
+
+    async def rodar():
+        async with cliente(app) as c:
+            headers = {"Idempotency-Key": "chave-1"}
+            await c.post("/itens", json={"a": 1}, headers=headers)
+            await c.post("/itens?pagina=2", json={"a": 1}, headers=headers)
+            await c.post("/itens", json={"a": 1})
+            await c.post("/itens", json={"a": 1})
+
+    asyncio.run(rodar())
+    assert app.state.execucoes == 4
+
+
+def test_erro_do_servidor_nao_e_guardado():
+    app = nova_app()
+
+    async def rodar():
+        async with cliente(app) as c:
+            headers = {"Idempotency-Key": "chave-1"}
+            return [await c.post("/falha", headers=headers) for _ in range(2)]
+
+    respostas = asyncio.run(rodar())
+    assert [r.status_code for r in respostas] == [500, 500]
+    assert app.state.execucoes == 2
+
+
+def test_modo_compartilhado_entre_workers(banco_compartilhado):
+    workers = [nova_app(), nova_app()]
+
+    async def rodar():
+        async with cliente(workers[0]) as c0, cliente(workers[1]) as c1:
+            headers = {"Idempotency-Key": "chave-1"}
+            simultaneas = await asyncio.gather(
+                *(c.post("/itens", json={"a": 1}, headers=headers) for c in (c0, c1, c0, c1))
+            )
+            outra = await c1.post("/itens", json={"a": 2}, headers=headers)
+            return simultaneas, outra
+
+    simultaneas, outra = asyncio.run(rodar())
+    assert sum(app.state.execucoes for app in workers) == 1
+    assert {r.status_code for r in simultaneas} == {201}
+    assert len({r.json()["numero"] for r in simultaneas}) == 1
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in simultaneas) == 3
+    assert outra.status_code == 422
+
+
+def test_modo_compartilhado_libera_a_chave_depois_de_erro(banco_compartilhado):
+    workers = [nova_app(), nova_app()]
+
+    async def rodar():
+        headers = {"Idempotency-Key": "chave-1"}
+        respostas = []
+        for app in workers:
+            async with cliente(app) as c:
+                respostas.append(await c.post("/falha", headers=headers))
+        return respostas
+
+    respostas = asyncio.run(rodar())
+    assert [r.status_code for r in respostas] == [500, 500]
+    assert [app.state.execucoes for app in workers] == [1, 1]
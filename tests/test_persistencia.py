@@ -0,0 +1,189 @@
+"""
+Garantias de recuperação do ArmazenamentoDuravel (snapshot + write-ahead log).
+
+Cada teste simula uma queda abandonando o armazenamento sem chamar
+`fechar()` (ou interrompendo o snapshot no meio) e abre um novo sobre o
+mesmo diretório, como faria a API ao reiniciar.
+"""
+import os
+import threading
+import time
+
+import pytest
+
+import persistencia
+from registros import InscricaoRegistro
+
+PARTIDA = 7
+
+
+def nova_colecao(lista):
+    return persistencia.Colecao(
+        lista,
+        chave=lambda registro: registro.id,
+        serializar=InscricaoRegistro.para_tupla,
+        desserializar=InscricaoRegistro.de_tupla,
+        empacotar=InscricaoRegistro.empacotar,
+        desempacotar=InscricaoRegistro.desempacotar,
+    )
+
+
+def abrir(diretorio, lista=None):
+    armazenamento = persistencia.ArmazenamentoDuravel(
+        str(diretorio),
+        colecoes={"inscricoes": nova_colecao(lista if lista is not None else [])},
+        # Sem compactação automática: os testes decidem quando há snapshot
+        intervalo=3600,
+        registros_por_snapshot=10**12,
+    )
+    armazenamento.recuperar()
+    return armazenamento
+
+
+def lista_de(armazenamento):
+    return armazenamento.colecoes["inscricoes"].lista
+
+
+def inserir(armazenamento, id, status="Pendente"):
+    registro = InscricaoRegistro(id, PARTIDA, 1000 + id, status)
+    with armazenamento.transacao():
+        lista_de(armazenamento).append(registro)
+        armazenamento.gravar("inscricoes", registro)
+    return registro
+
+
+def estado(armazenamento):
+    return sorted((r.id, r.status) for r in lista_de(armazenamento))
+
+
+def reabrir(armazenamento, diretorio):
+    # Queda: o processo some sem fechar(); só o que já foi para o disco conta
+    armazenamento._parar.set()
+    return abrir(diretorio)
+
+
+def test_recupera_snapshot_e_log(tmp_path):
+    armazenamento = abrir(tmp_path)
+    for id in range(1, 4):
+        inserir(armazenamento, id)
+    armazenamento.snapshot()
+    registro = lista_de(armazenamento)[0]
+    with armazenamento.transacao():
+        registro.status = "Confirmada"
+        armazenamento.gravar("inscricoes", registro)
+    with armazenamento.transacao():
+        lista_de(armazenamento).remove(registro)
+        armazenamento.remover("inscricoes", registro)
+
+    recuperado = reabrir(armazenamento, tmp_path)
+    assert estado(recuperado) == [(2, "Pendente"), (3, "Pendente")]
+
+
+def test_reaplica_segmento_anterior_e_atual(tmp_path):
+    armazenamento = abrir(tmp_path)
+    inserir(armazenamento, 1)
+    # Snapshot interrompido logo depois de rotacionar o log
+    with armazenamento._lock:
+        armazenamento.wal.rotacionar(armazenamento.caminho_wal_anterior)
+    inserir(armazenamento, 2)
+
+    assert os.path.exists(armazenamento.caminho_wal_anterior)
+    recuperado = reabrir(armazenamento, tmp_path)
+    assert estado(recuperado) == [(1, "Pendente"), (2, "Pendente")]
+    # A recuperação compacta tudo e descarta o segmento anterior
+    assert not os.path.exists(recuperado.caminho_wal_anterior)
+
+
+def test_ignora_ultima_linha_incompleta(tmp_path):
+    armazenamento = abrir(tmp_path)
+    inserir(armazenamento, 1)
+    inserir(armazenamento, 2)
+    armazenamento.fechar()
+    with open(armazenamento.caminho_wal, "a", encoding="utf-8") as arquivo:
+        arquivo.write('{"c":"inscricoes","op":"put","v":[3,')
+
+    recuperado = abrir(tmp_path)
+    assert estado(recuperado) == [(1, "Pendente"), (2, "Pendente")]
+
+
+@pytest.mark.parametrize("etapa", ["replace", "remove"])
+def test_queda_durante_o_snapshot(tmp_path, monkeypatch, etapa):
+    armazenamento = abrir(tmp_path)
+    inserir(armazenamento, 1)
+    armazenamento.snapshot()
+    inserir(armazenamento, 2)
+
+    # Queda antes de trocar o snapshot (fica o antigo + os dois segmentos)
+    # ou depois de trocar, mas antes de apagar o segmento anterior
+    original = getattr(os, etapa)
+    alvo = armazenamento.caminho_snapshot if etapa == "replace" else armazenamento.caminho_wal_anterior
+
+    def cair(*caminhos):
+        if caminhos[-1] == alvo:
+            raise OSError("queda simulada")
+        return original(*caminhos)
+
+    monkeypatch.setattr(persistencia.os, etapa, cair)
+    with pytest.raises(OSError):
+        armazenamento.snapshot()
+    monkeypatch.undo()
+    inserir(armazenamento, 3)
+
+    recuperado = reabrir(armazenamento, tmp_path)
+    assert estado(recuperado) == [(1, "Pendente"), (2, "Pendente"), (3, "Pendente")]
+
+
+def test_escrita_so_retorna_depois_do_fsync(tmp_path, monkeypatch):
+    armazenamento = abrir(tmp_path)
+    fsyncs = []
+    fsync_original = os.fsync
+
+    def fsync(descritor):
+        fsync_original(descritor)
+        fsyncs.append(armazenamento.wal.seq_escrito)
+
+    monkeypatch.setattr(persistencia.os, "fsync", fsync)
+
+    with armazenamento.transacao():
+        registro = InscricaoRegistro(1, PARTIDA, 1001, "Pendente")
+        lista_de(armazenamento).append(registro)
+        armazenamento.gravar("inscricoes", registro)
+        # Dentro da transação nada é sincronizado ainda
+        assert fsyncs == []
+    seq = armazenamento.wal.seq_escrito
+    assert fsyncs and fsyncs[-1] >= seq
+    assert armazenamento.wal.seq_duravel >= seq
+
+
+def test_escritas_simultaneas_compartilham_o_fsync(tmp_path, monkeypatch):
+    armazenamento = abrir(tmp_path)
+    fsyncs = []
+    fsync_original = os.fsync
+
+    def fsync_lento(descritor):
+        time.sleep(0.05)
+        fsync_original(descritor)
+        fsyncs.append(descritor)
+
+    monkeypatch.setattr(persistencia.os, "fsync", fsync_lento)
+    threads = [threading.Thread(target=inserir, args=(armazenamento, id)) for id in range(1, 17)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fsyncs) < len(threads)
+    assert armazenamento.wal.seq_duravel == armazenamento.wal.seq_escrito
+    recuperado = reabrir(armazenamento, tmp_path)
+    assert len(lista_de(recuperado)) == len(threads)
+
+
+def test_snapshot_de_outra_versao_e_recusado(tmp_path):
+    armazenamento = abrir(tmp_path)
+    inserir(armazenamento, 1)
+    armazenamento.fechar()
+    with open(armazenamento.caminho_snapshot, "r+b") as arquivo:
+        arquivo.write(persistencia.PREFIXO_SNAPSHOT + b"1\n")
+
+    with pytest.raises(ValueError, match="outro formato"):
+        abrir(tmp_path)